@@ -1,17 +1,39 @@
 from django.contrib import admin
 
 from .models import Post, Group, Follow, Comment
+from .search import ranked_post_ids
 
 
-class PostAdmin(admin.ModelAdmin):
+class FormFieldsAdmin(admin.ModelAdmin):
+    """При изменении сохраняет только поля формы.
+
+    Счётчики и оценки, которые сигналы сдвигают атомарными UPDATE, иначе
+    перезаписались бы значениями, прочитанными при открытии формы.
+    """
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        auto_now = [field.name for field in obj._meta.concrete_fields
+                    if getattr(field, 'auto_now', False)]
+        obj.save(update_fields=[*form.fields, *auto_now])
+
+
+class PostAdmin(FormFieldsAdmin):
 
     list_display = ('text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return (queryset.filter(pk__in=ranked_post_ids(search_term)),
+                False)
+
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(FormFieldsAdmin):
 
     list_display = ('title', 'slug', 'description', )
     prepopulated_fields = {'slug': ('title',)}
@@ -0,0 +1,180 @@
+"""JSON API: чтение лент и публикаций, массовые подписки.
+
+Ленты строятся теми же запросами, что и HTML-страницы (posts.feeds), и
+берутся из того же кеша страниц. Каждый ответ несёт строгий ETag и
+Last-Modified, а при актуальной копии у клиента отдаётся 304 без
+обращения к лентам.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from . import feed_cache, feeds
+from .conditional import conditional_response
+from .follows import follow_edges, unfollow_edges
+from .models import Group, Post
+from .paginators import COMMENTS_PAGE_SIZE, comments_after, encode_cursor
+
+
+User = get_user_model()
+
+COMPACT = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=COMPACT)
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'updated': post.updated.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+        'url': reverse('api_post', kwargs={'username': post.author.username,
+                                           'post_id': post.pk}),
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def serialize_group(group):
+    return {
+        'title': group.title,
+        'slug': group.slug,
+        'description': group.description,
+    }
+
+
+def serialize_author(author):
+    return {
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'posts': author.stats.post_count,
+        'followers': author.stats.follower_count,
+        'following': author.stats.following_count,
+    }
+
+
+def feed_data(request, queryset, scopes):
+    """Курсорная страница ленты со ссылками ``next`` и ``previous``."""
+    page, _ = feed_cache.paginate_cached(request, queryset, scopes)
+    next_cursor = getattr(page, 'next_cursor', None)
+    previous_cursor = getattr(page, 'previous_cursor', None)
+    return {
+        'results': [serialize_post(post) for post in page.object_list],
+        'next': (f'{request.path}?after={next_cursor}'
+                 if next_cursor else None),
+        'previous': (f'{request.path}?before={previous_cursor}'
+                     if previous_cursor else None),
+    }
+
+
+def index(request):
+    latest, scopes = feeds.index_feed()
+    return conditional_response(
+        request, scopes,
+        lambda: json_response(feed_data(request, latest, scopes)))
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    posts, scopes = feeds.group_feed(group)
+    return conditional_response(
+        request, scopes,
+        lambda: json_response({'group': serialize_group(group),
+                               **feed_data(request, posts, scopes)}))
+
+
+def profile(request, username):
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts, scopes = feeds.profile_feed(author)
+    return conditional_response(
+        request, scopes,
+        lambda: json_response({'author': serialize_author(author),
+                               **feed_data(request, posts, scopes)}))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Требуется авторизация'}, status=401)
+    posts, scopes = feeds.follow_feed(request.user)
+    return conditional_response(
+        request, scopes,
+        lambda: json_response(feed_data(request, posts, scopes)))
+
+
+def post_detail(request, username, post_id):
+    """Публикация и страница её комментариев после курсора ``after``."""
+    post = get_object_or_404(Post.objects.with_feed_data(),
+                             pk=post_id,
+                             author__username=username)
+
+    def build():
+        comments = list(comments_after(post.comments.all(),
+                                       request.GET.get('after'))
+                        [:COMMENTS_PAGE_SIZE + 1])
+        next_comments = None
+        if len(comments) > COMMENTS_PAGE_SIZE:
+            comments = comments[:COMMENTS_PAGE_SIZE]
+            cursor = encode_cursor(comments[-1], 'created')
+            next_comments = f'{request.path}?after={cursor}'
+        return json_response({
+            'post': serialize_post(post),
+            'comments': [serialize_comment(comment) for comment in comments],
+            'comments_next': next_comments,
+        })
+    return conditional_response(request, feeds.post_detail_scopes(post),
+                                build)
+
+
+@require_POST
+def bulk_follow(request):
+    """Подписывает текущего пользователя на авторов из ``follow`` и
+    отписывает от авторов из ``unfollow``; авторы задаются именами."""
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Требуется авторизация'}, status=401)
+    try:
+        data = json.loads(request.body)
+        follow = data.get('follow', [])
+        unfollow = data.get('unfollow', [])
+        if not isinstance(follow, list) or not isinstance(unfollow, list):
+            raise TypeError
+        if not all(isinstance(name, str) for name in follow + unfollow):
+            raise TypeError
+    except (ValueError, TypeError, AttributeError):
+        return json_response({'detail': 'Ожидался объект JSON со списками '
+                                        'follow и unfollow'}, status=400)
+    limit = getattr(settings, 'POSTS_BULK_FOLLOW_LIMIT', 1000)
+    if len(follow) + len(unfollow) > limit:
+        return json_response({'detail': f'Не больше {limit} авторов '
+                                        f'за запрос'}, status=400)
+    ids = dict(User.objects.filter(username__in=[*follow, *unfollow])
+               .values_list('username', 'pk'))
+    user_id = request.user.pk
+    followed = follow_edges((user_id, ids[name])
+                            for name in follow if name in ids)
+    unfollowed = unfollow_edges([(user_id, ids[name])
+                                 for name in unfollow if name in ids])
+    return json_response({
+        'followed': followed,
+        'unfollowed': unfollowed,
+        'unknown': sorted({*follow, *unfollow} - set(ids)),
+    })
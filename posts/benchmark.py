@@ -0,0 +1,275 @@
+"""Замеры задержки основных страниц на заполненной базе.
+
+Запросы идут через тестовый клиент Django, то есть через весь стек
+middleware и шаблонов, но без сетевого сервера.
+"""
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+VIEWS = ('index', 'group_posts', 'profile', 'post_view', 'follow_index',
+         'add_comment')
+MEMORY_SAMPLES = 5
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Benchmark:
+    """Прогоняет ``requests`` запросов к каждой странице из VIEWS.
+
+    Для каждой страницы считаются p50/p95/p99 задержки в миллисекундах,
+    медиана и максимум числа SQL-запросов и пиковое выделение памяти
+    Python на запрос. Память меряется отдельным коротким прогоном,
+    потому что tracemalloc сам замедляет обработку.
+    """
+
+    def __init__(self, requests=100, seed=0, cold=False):
+        self.requests = requests
+        self.rng = random.Random(seed)
+        self.cold = cold
+        self.client = Client(HTTP_HOST='localhost')
+
+    def prepare(self):
+        bounds = Post.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            raise ValueError('В базе нет публикаций')
+        self.post_bounds = bounds['low'], bounds['high']
+        self.group_slugs = list(Group.objects.values_list('slug', flat=True)
+                                .order_by('?')[:100])
+        stats = UserStats.objects.order_by('-following_count').first()
+        self.reader = (stats.user if stats is not None
+                       else User.objects.order_by('pk').first())
+        self.client.force_login(self.reader)
+
+    def random_post(self):
+        low, high = self.post_bounds
+        post = (Post.objects.select_related('author')
+                .filter(pk__gte=self.rng.randint(low, high))
+                .order_by('pk').first())
+        return post or Post.objects.select_related('author').first()
+
+    def request(self, view):
+        """Возвращает (метод, адрес, данные) для очередного запроса."""
+        if view == 'index':
+            return 'get', reverse('index'), None
+        if view == 'follow_index':
+            return 'get', reverse('follow_index'), None
+        if view == 'group_posts':
+            slug = self.rng.choice(self.group_slugs)
+            return 'get', reverse('group_posts', kwargs={'slug': slug}), None
+        post = self.random_post()
+        kwargs = {'username': post.author.username, 'post_id': post.pk}
+        if view == 'profile':
+            return ('get',
+                    reverse('profile',
+                            kwargs={'username': post.author.username}),
+                    None)
+        if view == 'post_view':
+            return 'get', reverse('post', kwargs=kwargs), None
+        return ('post', reverse('add_comment', kwargs=kwargs),
+                {'text': 'Комментарий из замера'})
+
+    def perform(self, view):
+        method, url, data = self.request(view)
+        if self.cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise ValueError(f'{url}: ответ {response.status_code}')
+        return elapsed * 1000, len(queries)
+
+    def measure(self, view):
+        if view == 'group_posts' and not self.group_slugs:
+            return None
+        timings, query_counts = [], []
+        for _ in range(self.requests):
+            elapsed, queries = self.perform(view)
+            timings.append(elapsed)
+            query_counts.append(queries)
+        peaks = []
+        for _ in range(min(MEMORY_SAMPLES, self.requests)):
+            tracemalloc.start()
+            try:
+                self.perform(view)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': percentile(query_counts, 50),
+            'max_queries': max(query_counts),
+            'peak_memory_kb': round(max(peaks) / 1024, 1),
+        }
+
+    def run(self, views=VIEWS):
+        self.prepare()
+        results = {}
+        for view in views:
+            measured = self.measure(view)
+            if measured is not None:
+                results[view] = measured
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'requests': self.requests,
+            'cold': self.cold,
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'results': results,
+        }
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(baseline, report, threshold=20.0, metric='p95_ms'):
+    """Сравнивает два отчёта.
+
+    Возвращает список строк (страница, было, стало, изменение в
+    процентах, регрессия ли) для страниц, замеренных в обоих отчётах.
+    """
+    rows = []
+    for view, current in report['results'].items():
+        previous = baseline['results'].get(view)
+        if previous is None:
+            continue
+        before, after = previous[metric], current[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((view, before, after, change, change > threshold))
+    return rows
+
+
+_aliases = itertools.count()
+
+
+def sqlite_throughput(engine, writers=4, readers=4, duration=5.0,
+                      options=None):
+    """Гоняет конкурентных читателей и писателей по временной базе SQLite.
+
+    Писатель в транзакции сначала читает, потом вставляет строку, как
+    add_comment со счётчиком; читатель выбирает последние строки, как
+    лента. Возвращает число операций в секунду и ошибок "database is
+    locked" для каждой стороны.
+    """
+    handle, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    # Обёртки соединений кешируются по алиасу, поэтому он каждый раз новый.
+    alias = f'sqlite_throughput_{next(_aliases)}'
+    connections.databases[alias] = {'ENGINE': engine, 'NAME': path,
+                                    **(options or {})}
+    connections.ensure_defaults(alias)
+    connections.prepare_test_settings(alias)
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE bench_comment ('
+                           'id INTEGER PRIMARY KEY, '
+                           'post_id INTEGER, text TEXT)')
+            cursor.execute('CREATE INDEX bench_comment_post '
+                           'ON bench_comment (post_id)')
+        connections[alias].close()
+        return _run_workers(alias, writers, readers, duration)
+    finally:
+        del connections.databases[alias]
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def _run_workers(alias, writers, readers, duration):
+    counts = {'writes': 0, 'reads': 0,
+              'write_errors': 0, 'read_errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(writers + readers)
+    rng = random.Random(0)
+
+    def write():
+        post_id = rng.randint(1, 100)
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM bench_comment '
+                               'WHERE post_id = %s', [post_id])
+                cursor.execute('INSERT INTO bench_comment (post_id, text) '
+                               'VALUES (%s, %s)',
+                               [post_id, 'Комментарий из замера'])
+
+    def read():
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT id, post_id, text FROM bench_comment '
+                           'ORDER BY id DESC LIMIT 10')
+            cursor.fetchall()
+
+    def worker(operation, done, failed):
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        succeeded = errors = 0
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    operation()
+                    succeeded += 1
+                except OperationalError:
+                    errors += 1
+        finally:
+            connections[alias].close()
+            with lock:
+                counts[done] += succeeded
+                counts[failed] += errors
+
+    threads = (
+        [threading.Thread(target=worker,
+                          args=(write, 'writes', 'write_errors'))
+         for _ in range(writers)]
+        + [threading.Thread(target=worker,
+                            args=(read, 'reads', 'read_errors'))
+           for _ in range(readers)]
+    )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'writes_per_second': round(counts['writes'] / duration, 1),
+        'reads_per_second': round(counts['reads'] / duration, 1),
+        'write_errors': counts['write_errors'],
+        'read_errors': counts['read_errors'],
+    }
@@ -0,0 +1,45 @@
+"""Условные GET-запросы: ETag и Last-Modified по версиям областей кеша.
+
+Версии областей из posts.feed_cache меняются при любом изменении
+данных страницы, поэтому проверка копии клиента не требует запросов
+лент к базе, а ответ 304 отдаётся без отрисовки.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import feed_cache
+
+
+def validators(request, scopes, weak=False):
+    """Возвращает (etag, last_modified) для страницы ``request``.
+
+    В ETag входят версии областей, адрес с параметрами и пользователь,
+    потому что страницы для разных читателей различаются.
+    """
+    scopes = (feed_cache.ALL_SCOPE, *scopes)
+    versions = feed_cache.get_versions(scopes)
+    parts = [f'{scope}={version}' for scope, version in zip(scopes, versions)]
+    parts.extend([request.get_full_path(), str(request.user.pk)])
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    etag = f'W/"{digest}"' if weak else f'"{digest}"'
+    return etag, feed_cache.get_last_modified(scopes)
+
+
+def conditional_response(request, scopes, build, weak=False):
+    """Отвечает 304, если у клиента актуальная копия, иначе вызывает
+    ``build`` и добавляет к ответу ETag и Last-Modified."""
+    if request.method not in ('GET', 'HEAD'):
+        return build()
+    etag, last_modified = validators(request, scopes, weak)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = build()
+        if not 200 <= response.status_code < 300:
+            return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
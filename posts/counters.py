@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+
+def increment(model, pk, field, delta=1):
+    """Атомарно сдвигает счётчик, не вычитая ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def increment_user(user_id, field, delta=1):
+    if not increment(UserStats, user_id, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        increment(UserStats, user_id, field, delta)
+
+
+def _count(model, field, outer='pk'):
+    rows = (model.objects.filter(**{field: OuterRef(outer)})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def counter_definitions():
+    """Возвращает тройки (модель, поле счётчика, выражение пересчёта)."""
+    return (
+        (Post, 'comment_count', _count(Comment, 'post')),
+        (Group, 'post_count', _count(Post, 'group')),
+        (UserStats, 'follower_count', _count(Follow, 'author', 'user_id')),
+        (UserStats, 'following_count', _count(Follow, 'user', 'user_id')),
+        (UserStats, 'post_count', _count(Post, 'author', 'user_id')),
+    )
+
+
+def recount(model, pks, field):
+    """Пересчитывает счётчик ``field`` у строк ``pks`` одним UPDATE."""
+    for counter_model, counter_field, expression in counter_definitions():
+        if counter_model is model and counter_field == field:
+            return (model.objects.filter(pk__in=pks)
+                    .update(**{field: expression}))
+    raise ValueError(f'Нет счётчика {model.__name__}.{field}')
+
+
+def create_missing_user_stats():
+    # Размер пачки выбирает бэкенд: у SQLite жёсткий предел на число
+    # строк в одном INSERT.
+    missing = (User.objects.filter(stats__isnull=True)
+               .values_list('pk', flat=True))
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing.iterator()],
+        ignore_conflicts=True,
+    )
+
+
+def repair_counters(batch_size=1000):
+    """Пересчитывает счётчики пачками по первичному ключу.
+
+    Возвращает словарь ``{'Модель.поле': число исправленных строк}``.
+    """
+    create_missing_user_stats()
+    repaired = {}
+    for model, field, expression in counter_definitions():
+        fixed = 0
+        last_pk = None
+        while True:
+            queryset = model.objects.order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            rows = list(queryset.annotate(actual=expression)
+                        .values_list('pk', field, 'actual')[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            drifted = [model(pk=pk, **{field: actual})
+                       for pk, stored, actual in rows if stored != actual]
+            model.objects.bulk_update(drifted, [field])
+            fixed += len(drifted)
+        repaired[f'{model.__name__}.{field}'] = fixed
+    return repaired
@@ -0,0 +1,187 @@
+"""Генерация больших наборов данных для нагрузочных замеров.
+
+Строки вставляются через bulk_create пачками, минуя сигналы, поэтому
+после загрузки счётчики, ленты подписок и поисковый индекс
+пересчитываются целиком.
+"""
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from . import feed_cache, groups, trending
+from .counters import create_missing_user_stats, repair_counters
+from .models import Comment, Follow, Group, Post
+from .search import rebuild_index
+from .timeline import get_timeline_store
+from .utils import batched
+
+
+User = get_user_model()
+
+WORDS = (
+    'панда бамбук лес утро вечер город река гора дорога дом кот собака '
+    'книга музыка кофе чай снег дождь солнце море поезд друг работа '
+    'выходные прогулка фото история новость праздник ужин завтрак сон '
+    'весна лето осень зима путешествие парк мост окно небо звезда'
+).split()
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Временно отключает auto_now/auto_now_add, чтобы задать даты явно."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def zipf_weights(count, exponent=1.1):
+    """Накопленные веса распределения Ципфа для ``count`` элементов."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def sentence(rng, min_words=5, max_words=40):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize() + '.'
+
+
+class DataGenerator:
+    """Заполняет базу пользователями, группами, подписками, публикациями
+    и комментариями.
+
+    Популярность авторов распределена по Ципфу: немногие авторы
+    собирают большую часть подписчиков и публикаций.
+    """
+
+    def __init__(self, prefix='bench', seed=0, batch_size=5000, days=365,
+                 log=None):
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.log = log or (lambda message: None)
+
+    def ids(self, queryset):
+        return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    def create_users(self, count):
+        password = make_password(None)
+        users = (User(username=f'{self.prefix}_{number}', password=password)
+                 for number in range(count))
+        for batch in batched(users, self.batch_size):
+            User.objects.bulk_create(batch, ignore_conflicts=True)
+        create_missing_user_stats()
+        self.log(f'Пользователей: {count}')
+        return self.ids(User.objects.filter(
+            username__startswith=f'{self.prefix}_'))
+
+    def create_groups(self, count):
+        groups = (Group(title=f'Группа {number}',
+                        slug=f'{self.prefix}-{number}',
+                        description=sentence(self.rng))
+                  for number in range(count))
+        for batch in batched(groups, self.batch_size):
+            Group.objects.bulk_create(batch, ignore_conflicts=True)
+        self.log(f'Групп: {count}')
+        return self.ids(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-'))
+
+    def create_follows(self, count, user_ids):
+        if len(user_ids) < 2:
+            return
+        popularity = zipf_weights(len(user_ids))
+
+        def follows():
+            for _ in range(count):
+                user_id = self.rng.choice(user_ids)
+                author_id = self.rng.choices(user_ids,
+                                             cum_weights=popularity)[0]
+                if user_id != author_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        for batch in batched(follows(), self.batch_size):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+        self.log(f'Подписок: до {count}')
+
+    def random_date(self, now):
+        return now - timedelta(seconds=self.rng.randint(0, self.days * 86400))
+
+    def create_posts(self, count, user_ids, group_ids):
+        # Активность авторов не связана с числом подписчиков, иначе
+        # самые читаемые авторы раздували бы ленты подписок квадратично.
+        writers = list(user_ids)
+        self.rng.shuffle(writers)
+        activity = zipf_weights(len(writers), exponent=0.8)
+        now = timezone.now()
+
+        def posts():
+            for _ in range(count):
+                pub_date = self.random_date(now)
+                group_id = None
+                if group_ids and self.rng.random() < 0.7:
+                    group_id = self.rng.choice(group_ids)
+                yield Post(text=sentence(self.rng),
+                           author_id=self.rng.choices(
+                               writers, cum_weights=activity)[0],
+                           group_id=group_id,
+                           pub_date=pub_date,
+                           updated=pub_date)
+
+        fields = (Post._meta.get_field('pub_date'),
+                  Post._meta.get_field('updated'))
+        with explicit_dates(*fields):
+            for batch in batched(posts(), self.batch_size):
+                Post.objects.bulk_create(batch)
+        self.log(f'Публикаций: {count}')
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        now = timezone.now()
+        comments = (Comment(text=sentence(self.rng, max_words=15),
+                            author_id=self.rng.choice(user_ids),
+                            post_id=self.rng.choice(post_ids),
+                            created=self.random_date(now))
+                    for _ in range(count))
+        with explicit_dates(Comment._meta.get_field('created')):
+            for batch in batched(comments, self.batch_size):
+                Comment.objects.bulk_create(batch)
+        self.log(f'Комментариев: {count}')
+
+    def finish(self):
+        """Пересчитывает всё, что обычно поддерживают сигналы."""
+        repair_counters(self.batch_size)
+        self.log('Счётчики пересчитаны')
+        get_timeline_store().rebuild()
+        self.log('Ленты подписок разложены')
+        for _ in rebuild_index(batch_size=self.batch_size,
+                               missing_only=True):
+            pass
+        self.log('Поисковый индекс построен')
+        trending.rebuild()
+        self.log('Популярное пересчитано')
+        groups.refresh()
+        groups.recount_activity()
+        self.log('Сводка по группам пересчитана')
+        feed_cache.bump(feed_cache.ALL_SCOPE)
+
+    def generate(self, users, groups, follows, posts, comments):
+        user_ids = self.create_users(users)
+        group_ids = self.create_groups(groups)
+        self.create_follows(follows, user_ids)
+        if user_ids:
+            self.create_posts(posts, user_ids, group_ids)
+            self.create_comments(comments, user_ids,
+                                 self.ids(Post.objects.all()))
+        self.finish()
@@ -0,0 +1,90 @@
+"""Планы выполнения запросов лент на текущей базе.
+
+Запросы берутся из posts.feeds, как в представлениях, для самой крупной
+группы, самого активного автора и читателя с наибольшим числом
+подписок, чтобы планы отражали худший случай.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Count
+
+from . import feeds
+from .groups import directory
+from .models import Follow, Group, Post, UserStats
+from .paginators import COMMENTS_PAGE_SIZE, CursorPaginator, comments_after
+from .search import candidates, tokenize
+
+
+# Строки плана, означающие полный просмотр таблицы или сортировку.
+PROBLEM_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN \w+$|USE TEMP B-TREE'),
+    'postgresql': re.compile(r'Seq Scan|\bSort\b'),
+}
+
+
+def samples():
+    """Возвращает (группа, автор, читатель, публикация); любое может
+    оказаться None на пустой базе."""
+    group = (Group.objects.annotate(total=Count('posts'))
+             .order_by('-total').first())
+    author = UserStats.objects.order_by('-post_count').first()
+    reader = UserStats.objects.order_by('-following_count').first()
+    post = Post.objects.order_by('-comment_count', '-pk').first()
+    return (group,
+            author.user if author is not None else None,
+            reader.user if reader is not None else None,
+            post)
+
+
+def feed_queries():
+    """Список пар (имя, запрос) для всех запросов лент."""
+    group, author, reader, post = samples()
+    latest, _ = feeds.index_feed()
+    queries = [('index', CursorPaginator(latest).page_queryset())]
+    if post is not None:
+        queries.append(('index_after', CursorPaginator(latest).page_queryset(
+            after=(post.pub_date, post.pk))))
+    if group is not None:
+        queries.append(('group_posts', CursorPaginator(
+            feeds.group_feed(group)[0]).page_queryset()))
+        groups = CursorPaginator(directory(), field='last_activity')
+        queries.append(('group_list', groups.page_queryset()))
+        queries.append(('group_list_after', groups.page_queryset(
+            after=(group.last_activity, group.pk))))
+    if author is not None:
+        queries.append(('profile', CursorPaginator(
+            feeds.profile_feed(author)[0]).page_queryset()))
+        queries.append(('followers', Follow.objects
+                        .filter(author_id=author.pk)
+                        .values_list('user_id', flat=True)))
+    if reader is not None:
+        # Лента подписок сливает несколько диапазонов: разложенные
+        # публикации и по диапазону на каждого подтягиваемого автора.
+        limit = CursorPaginator(latest).per_page + 1
+        pushed, *pulled = feeds.follow_feed(reader)[0].sources()
+        queries.append(('follow_index', pushed[:limit]))
+        queries.extend(('follow_index_pulled', source[:limit])
+                       for source in pulled[:1])
+    if author is not None and reader is not None:
+        queries.append(('following', author.following.filter(user=reader)))
+    if post is not None:
+        queries.append(('comments', comments_after(post.comments.all())
+                        [:COMMENTS_PAGE_SIZE + 1]))
+        terms = tokenize(post.text)
+        if terms:
+            queries.append(('search', candidates(terms[:1])
+                            [:CursorPaginator(latest).per_page + 1]))
+            if len(terms) > 1:
+                queries.append(('search_all_terms', candidates(terms[:2])
+                                [:CursorPaginator(latest).per_page + 1]))
+    return queries
+
+
+def problems(plan, vendor=None):
+    """Строки плана с полным просмотром таблицы или сортировкой."""
+    pattern = PROBLEM_PATTERNS.get(vendor or connection.vendor)
+    if pattern is None:
+        return []
+    return [line.strip() for line in plan.splitlines()
+            if pattern.search(line.strip())]
@@ -0,0 +1,282 @@
+import hashlib
+import logging
+import math
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+
+from yatube.db.routers import primary
+
+from . import instrumentation
+from .models import Follow
+from .paginators import PAGE_SIZE, CursorPaginator, paginate
+
+
+logger = logging.getLogger(__name__)
+
+ALL_SCOPE = 'all'
+INDEX_SCOPE = 'index'
+GROUPS_SCOPE = 'groups'
+RECOMMENDATIONS_SCOPE = 'recommendations'
+TRENDING_SCOPE = 'trending'
+
+FOLLOWER_BATCH_SIZE = 1000
+
+stats = Counter()
+_executor = None
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def version_key(scope):
+    return f'posts:version:{scope}'
+
+
+def modified_key(scope):
+    return f'posts:modified:{scope}'
+
+
+def get_versions(scopes):
+    """Возвращает текущие версии областей кеша.
+
+    Пропавшая из кеша версия заводится заново значением от часов, чтобы
+    не совпасть ни с одной из прежних и не поднять устаревшие страницы.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def get_last_modified(scopes):
+    """Время последнего изменения областей в целых секундах.
+
+    Пропавшая отметка заводится текущим временем: клиенты один раз
+    перекачают неизменившуюся страницу, но не получат устаревшую.
+    """
+    keys = [modified_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    now = int(time.time())
+    for key in keys:
+        if key not in found:
+            cache.add(key, now, None)
+            found[key] = cache.get(key, now)
+    return max(found.values())
+
+
+def bump(*scopes):
+    scopes = set(scopes)
+    for scope in scopes:
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+    now = int(time.time())
+    cache.set_many({modified_key(scope): now for scope in scopes}, None)
+
+
+def record(outcome):
+    stats[outcome] += 1
+    instrumentation.count(f'cache_{outcome}')
+
+
+def hit_rate():
+    total = stats['hits'] + stats['stale'] + stats['misses']
+    return (stats['hits'] + stats['stale']) / total if total else 0.0
+
+
+def feed_keys(scopes, request):
+    """Возвращает ключ текущей версии страницы и ключ её последней копии."""
+    cursor = [request.GET.get('after', ''), request.GET.get('before', '')]
+    versions = get_versions(scopes)
+    versioned = '|'.join(
+        [f'{scope}={version}' for scope, version in zip(scopes, versions)]
+        + cursor
+    )
+    latest = '|'.join(list(scopes) + cursor)
+    return ('posts:feed:' + hashlib.md5(versioned.encode()).hexdigest(),
+            'posts:feed:stale:' + hashlib.md5(latest.encode()).hexdigest())
+
+
+def should_recompute(entry, beta=1.0):
+    """Вероятностный досрочный пересчёт (XFetch).
+
+    Чем ближе истечение записи и чем дольше она считалась, тем выше
+    шанс, что очередной запрос пересчитает её заранее, пока остальные
+    ещё получают готовое значение.
+    """
+    value, delta, expires_at = entry
+    return time.time() - delta * beta * math.log(random.random()) >= expires_at
+
+
+def get_or_compute(key, stale_key, compute, timeout):
+    """Отдаёт значение из кеша, пересчитывая его не более одного раза.
+
+    Пересчёт выполняет только получивший блокировку ``cache.add``
+    процесс; остальные тем временем отдают последнюю известную копию
+    из ``stale_key`` или ждут появления свежей. Если за время блокировки
+    она так и не появилась, а блокировка всё ещё занята, значение
+    считается для этого запроса без записи в кеш.
+    """
+    entry = cache.get(key)
+    if entry is not None and not should_recompute(entry):
+        record('hits')
+        return entry[0]
+
+    lock_key = key + ':lock'
+    lock_timeout = getattr(settings, 'POSTS_FEED_LOCK_TIMEOUT', 10)
+    if not cache.add(lock_key, 1, lock_timeout):
+        if entry is not None:
+            record('hits')
+            return entry[0]
+        stale = cache.get(stale_key)
+        if stale is not None:
+            record('stale')
+            return stale
+        deadline = time.time() + lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                record('hits')
+                return entry[0]
+        if not cache.add(lock_key, 1, lock_timeout):
+            stale = cache.get(stale_key)
+            if stale is not None:
+                record('stale')
+                return stale
+            record('busy')
+            return compute()
+
+    record('misses')
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+        cache.set(stale_key, value, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def paginate_cached(request, queryset, scopes, per_page=PAGE_SIZE):
+    """Как paginate(), но курсорные страницы берутся из кеша.
+
+    Ключ страницы складывается из версий ``scopes``, поэтому сигналы
+    из posts.signals сбрасывают её сразу после изменения данных, а
+    сама запись может жить долго.
+    """
+    if request.GET.get('page') is not None:
+        return paginate(request, queryset, per_page)
+
+    def compute():
+        # Запись живёт до следующего изменения, поэтому считается по
+        # основной базе: отстающая реплика закрепила бы в кеше старую
+        # страницу под новой версией.
+        with primary():
+            page, _ = paginate(request, queryset, per_page)
+        return (list(page.object_list),
+                page.next_cursor,
+                page.previous_cursor)
+
+    key, stale_key = feed_keys((ALL_SCOPE, *scopes), request)
+    rows, next_cursor, previous_cursor = get_or_compute(
+        key, stale_key, compute,
+        getattr(settings, 'POSTS_FEED_CACHE_TIMEOUT', 60 * 60))
+    logger.debug('feed cache hit rate %.2f', hit_rate())
+    page = CursorPaginator(queryset, per_page).make_page(
+        rows, next_cursor, previous_cursor)
+    return page, Paginator(queryset, per_page)
+
+
+def post_scopes(post, group_ids=()):
+    scopes = [INDEX_SCOPE, profile_scope(post.author_id)]
+    scopes.extend(group_scope(group_id)
+                  for group_id in {post.group_id, *group_ids}
+                  if group_id is not None)
+    return scopes
+
+
+def bump_followers(author_id):
+    """Сбрасывает ленты подписок всех подписчиков автора пачками по
+    диапазону индекса follow_author_user_idx."""
+    last_user_id = 0
+    while True:
+        user_ids = list(Follow.objects
+                        .filter(author_id=author_id, user_id__gt=last_user_id)
+                        .order_by('user_id')
+                        .values_list('user_id', flat=True)
+                        [:FOLLOWER_BATCH_SIZE])
+        if not user_ids:
+            return
+        bump(*(follow_scope(user_id) for user_id in user_ids))
+        last_user_id = user_ids[-1]
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POSTS_FEED_BUMP_WORKERS)
+    return _executor
+
+
+def _bump_followers_in_thread(author_id):
+    try:
+        bump_followers(author_id)
+    finally:
+        # У потока пула своё соединение с базой.
+        connection.close()
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error('follow feed invalidation failed',
+                     exc_info=future.exception())
+
+
+def schedule_follower_bump(author_id):
+    """После коммита сбрасывает ленты подписок подписчиков автора в
+    фоновом потоке, чтобы запрос не ждал по сбросу на подписчика."""
+    def submit():
+        if not settings.POSTS_FEED_BUMP_WORKERS:
+            bump_followers(author_id)
+            return
+        get_executor().submit(
+            _bump_followers_in_thread, author_id).add_done_callback(
+            _log_failure)
+
+    transaction.on_commit(submit)
+
+
+def invalidate_post(post, group_ids=()):
+    """Сбрасывает все ленты, в которых показывается публикация.
+
+    Ленты подписок сбрасываются после коммита в фоне, см.
+    schedule_follower_bump().
+    """
+    bump(*post_scopes(post, group_ids))
+    schedule_follower_bump(post.author_id)
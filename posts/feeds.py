@@ -0,0 +1,34 @@
+"""Запросы лент и области кеша, от версий которых они зависят.
+
+Общие для HTML-страниц, JSON API и команды explain_feeds.
+"""
+from . import feed_cache
+from .models import Post
+from .timeline import get_timeline_store
+
+
+def index_feed():
+    return Post.objects.with_feed_data(), [feed_cache.INDEX_SCOPE]
+
+
+def group_feed(group):
+    return (group.posts.with_feed_data(),
+            [feed_cache.group_scope(group.pk)])
+
+
+def profile_feed(author):
+    return (author.posts.with_feed_data(),
+            [feed_cache.profile_scope(author.pk)])
+
+
+def follow_feed(user):
+    # Одна область на читателя: публикации авторов сбрасывают её у всех
+    # подписчиков в фоне, см. feed_cache.schedule_follower_bump().
+    return (get_timeline_store().feed(user).with_feed_data(),
+            [feed_cache.follow_scope(user.pk)])
+
+
+def post_detail_scopes(post):
+    """Области, сбрасываемые при изменении публикации, её комментариев
+    и подписок на автора."""
+    return [feed_cache.profile_scope(post.author_id)]
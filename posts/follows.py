@@ -0,0 +1,179 @@
+"""Подписки: одиночные без гонок, массовые и импорт графа подписок.
+
+follow() и unfollow() меняют подписку одним запросом, который ничего
+не делает, если подписка уже в нужном состоянии, поэтому повторы и
+параллельные запросы не падают на unique_follow. Счётчики, ленту и кеш
+обновляет только тот запрос, который действительно изменил строку:
+счётчики и ленту в той же транзакции, кеш после её коммита.
+
+Массовые подписки вставляются bulk_create пачками, по транзакции на
+пачку, а повторы отсекает то же ограничение. Сигналы при этом не
+срабатывают, поэтому счётчики, ленты подписок и кеш страниц
+обновляются сразу для всей пачки.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from . import feed_cache
+from .counters import increment_user, recount
+from .models import Follow, UserStats
+from .timeline import get_timeline_store
+from .utils import batched
+
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def invalidate(user_ids, author_ids):
+    """После коммита сбрасывает ленты подписчиков и профили обеих
+    сторон: страницы профилей показывают счётчики подписок.
+
+    Сброс до коммита дал бы параллельному читателю сохранить страницу
+    из старых данных под новой версией.
+    """
+    scopes = [*(feed_cache.follow_scope(user_id) for user_id in user_ids),
+              *(feed_cache.profile_scope(pk)
+                for pk in {*user_ids, *author_ids})]
+    transaction.on_commit(lambda: feed_cache.bump(*scopes))
+
+
+def followed(user_id, author_id):
+    """Всё, что следует за созданием одной подписки."""
+    increment_user(author_id, 'follower_count')
+    increment_user(user_id, 'following_count')
+    get_timeline_store().follow(user_id, author_id)
+    invalidate([user_id], [author_id])
+
+
+def unfollowed(user_id, author_id):
+    """Всё, что следует за удалением одной подписки."""
+    increment_user(author_id, 'follower_count', -1)
+    increment_user(user_id, 'following_count', -1)
+    get_timeline_store().unfollow(user_id, author_id)
+    invalidate([user_id], [author_id])
+
+
+def follow(user_id, author_id):
+    """Подписывает пользователя на автора, если он ещё не подписан.
+
+    Возвращает True, если подписка создана этим вызовом.
+    """
+    if user_id == author_id:
+        return False
+    ops = connection.ops
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{ops.insert_statement(ignore_conflicts=True)} '
+                f'{ops.quote_name(Follow._meta.db_table)} '
+                f'(user_id, author_id) VALUES (%s, %s) '
+                f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+                [user_id, author_id])
+            created = cursor.rowcount == 1
+        if created:
+            followed(user_id, author_id)
+    return created
+
+
+def unfollow(user_id, author_id):
+    """Отписывает пользователя от автора, если он подписан.
+
+    Возвращает True, если подписка удалена этим вызовом.
+    """
+    table = connection.ops.quote_name(Follow._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE user_id = %s AND author_id = %s',
+                [user_id, author_id])
+            removed = cursor.rowcount == 1
+        if removed:
+            unfollowed(user_id, author_id)
+    return removed
+
+
+def follow_edges(edges):
+    """Создаёт подписки из пар (user_id, author_id) одной транзакцией.
+
+    Подписки на себя и уже существующие пропускаются. Возвращает число
+    новых подписок.
+    """
+    edges = {(user_id, author_id) for user_id, author_id in edges
+             if user_id != author_id}
+    if not edges:
+        return 0
+    user_ids = {user_id for user_id, _ in edges}
+    author_ids = {author_id for _, author_id in edges}
+    with transaction.atomic():
+        existing = set(Follow.objects
+                       .filter(user_id__in=user_ids, author_id__in=author_ids)
+                       .values_list('user_id', 'author_id'))
+        created = edges - existing
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in created],
+            ignore_conflicts=True)
+        # Счётчики пересчитываются запросом, а не сдвигаются на
+        # len(created): параллельная подписка могла опередить вставку.
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in user_ids | author_ids],
+            ignore_conflicts=True)
+        recount(UserStats, author_ids, 'follower_count')
+        recount(UserStats, user_ids, 'following_count')
+        get_timeline_store().follow_many(created)
+    invalidate(user_ids, author_ids)
+    return len(created)
+
+
+def unfollow_edges(edges):
+    """Удаляет подписки из пар (user_id, author_id) одной транзакцией.
+
+    Каждая пара удаляется через unfollow(), поэтому функция подходит
+    для сотен пар, а не для миллионов. Возвращает число удалённых
+    подписок.
+    """
+    with transaction.atomic():
+        return sum(unfollow(user_id, author_id)
+                   for user_id, author_id in set(edges))
+
+
+def _resolve(pairs, field):
+    pairs = list(pairs)
+    keys = {key for pair in pairs for key in pair}
+    ids = dict(User.objects.filter(**{f'{field}__in': keys})
+               .values_list(field, 'pk'))
+    edges = [(ids[user], ids[author]) for user, author in pairs
+             if user in ids and author in ids]
+    return edges, keys - set(ids)
+
+
+def resolve_usernames(pairs):
+    """Переводит пары имён (подписчик, автор) в пары id.
+
+    Возвращает (пары id, множество неизвестных имён).
+    """
+    return _resolve(pairs, 'username')
+
+
+def resolve_ids(pairs):
+    """Оставляет пары id, оба пользователя которых существуют.
+
+    Возвращает (пары id, множество неизвестных id).
+    """
+    return _resolve(((int(user), int(author)) for user, author in pairs),
+                    'pk')
+
+
+def import_edges(edges, batch_size=BATCH_SIZE, usernames=False):
+    """Импортирует подписки пачками по ``batch_size`` пар.
+
+    ``edges`` - пары id или, при ``usernames``, пары имён. Для каждой
+    пачки отдаёт (обработано пар, создано подписок, неизвестные имена
+    или id).
+    """
+    resolve = resolve_usernames if usernames else resolve_ids
+    for batch in batched(edges, batch_size):
+        batch_edges, unknown = resolve(batch)
+        yield len(batch), follow_edges(batch_edges), unknown
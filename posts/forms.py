@@ -1,5 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from .imaging import read_image_header, strip_jpeg_exif
 from .models import Comment, Post
 
 
@@ -10,6 +14,44 @@ class PostForm(forms.ModelForm):
 
     text = forms.CharField(label='Введите Текст публикации', widget=forms.Textarea)
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.POSTS_IMAGE_MAX_BYTES:
+            raise forms.ValidationError(
+                'Файл слишком большой, максимум '
+                f'{filesizeformat(settings.POSTS_IMAGE_MAX_BYTES)}')
+        (width, height), exif_size = read_image_header(image_source(image))
+        image.seek(0)
+        if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                f'Слишком большое разрешение: {width}x{height}')
+        if exif_size > settings.POSTS_IMAGE_MAX_EXIF_BYTES:
+            image = without_exif(image)
+        return image
+
+
+def image_source(image):
+    if hasattr(image, 'temporary_file_path'):
+        return image.temporary_file_path()
+    return image
+
+
+def without_exif(image):
+    """Копия JPEG-файла без Exif; остальные файлы возвращаются как есть."""
+    stripped = TemporaryUploadedFile(image.name, image.content_type,
+                                     0, image.charset)
+    try:
+        strip_jpeg_exif(image, stripped)
+    except ValueError:
+        stripped.close()
+        image.seek(0)
+        return image
+    stripped.size = stripped.tell()
+    stripped.seek(0)
+    return stripped
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,123 @@
+"""Сводка по группам для каталога /groups/ и страницы группы.
+
+Число публикаций и время последней активности хранятся в самой
+группе и сдвигаются сигналами из posts.signals при каждой публикации и
+комментарии; после удаления или переноса публикации время активности
+пересчитывается только для затронутой группы. Самых активных авторов
+раз в несколько минут пересчитывает команда refresh_group_stats в
+таблицу GroupPoster. Поэтому каталог
+читает одну страницу групп по индексу и их авторов одним запросом, без
+COUNT по публикациям.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (Case, DateTimeField, F, Max, OuterRef,
+                              Prefetch, Subquery, Value, When)
+from django.db.models.functions import Coalesce, Greatest
+
+from . import feed_cache
+from .models import Comment, Group, GroupPoster, Post
+
+
+def top_posters_shown():
+    return getattr(settings, 'POSTS_GROUP_TOP_POSTERS', 3)
+
+
+def _later(moment):
+    # Без output_field SQLite сохранил бы дату строкой в формате ISO,
+    # которая неверно сравнивается с остальными.
+    return Case(When(last_activity__gte=moment, then=F('last_activity')),
+                default=Value(moment, output_field=DateTimeField()))
+
+
+def posted(group_id, moment):
+    """Учитывает новую публикацию группы одним UPDATE."""
+    Group.objects.filter(pk=group_id).update(
+        post_count=F('post_count') + 1, last_activity=_later(moment))
+
+
+def touch(group_id, moment):
+    """Сдвигает время последней активности группы вперёд."""
+    Group.objects.filter(pk=group_id).update(last_activity=_later(moment))
+
+
+def top_posters(group):
+    return (GroupPoster.objects.filter(group=group)
+            .select_related('author').order_by('rank'))
+
+
+def directory():
+    """Группы по убыванию активности вместе с их лучшими авторами."""
+    posters = (GroupPoster.objects.filter(rank__lte=top_posters_shown())
+               .select_related('author').order_by('rank'))
+    return (Group.objects.order_by('-last_activity', '-pk')
+            .prefetch_related(Prefetch('top_posters', queryset=posters)))
+
+
+def _latest(model, field, lookup):
+    rows = (model.objects.filter(**{lookup: OuterRef('pk')})
+            .order_by().values(lookup).annotate(latest=Max(field))
+            .values('latest'))
+    return Subquery(rows)
+
+
+def _activity():
+    posts = _latest(Post, 'pub_date', 'group')
+    comments = _latest(Comment, 'created', 'post__group')
+    # GREATEST в SQLite возвращает NULL, если NULL хотя бы один аргумент.
+    return Greatest(Coalesce(posts, comments), Coalesce(comments, posts))
+
+
+def recount_activity(group_ids=None):
+    """Пересчитывает время активности групп ``group_ids`` или всех."""
+    queryset = Group.objects.all()
+    if group_ids is not None:
+        queryset = queryset.filter(pk__in=group_ids)
+    queryset.update(last_activity=_activity())
+
+
+def forget(group_id, moment):
+    """Пересчитывает время активности группы после удаления комментария
+    от ``moment``, если он мог быть последним."""
+    Group.objects.filter(pk=group_id, last_activity__lte=moment).update(
+        last_activity=_activity())
+
+
+def forget_post(group_id, pub_date):
+    """Пересчитывает время активности группы после удаления публикации
+    вместе с комментариями. Комментарии не раньше самой публикации,
+    поэтому последними они могли быть, только если время группы не
+    раньше ``pub_date``."""
+    Group.objects.filter(pk=group_id, last_activity__gte=pub_date).update(
+        last_activity=_activity())
+
+
+def _refresh_posters(cursor, limit):
+    quote = connection.ops.quote_name
+    posters = quote(GroupPoster._meta.db_table)
+    post = quote(Post._meta.db_table)
+    cursor.execute(f'DELETE FROM {posters}')
+    cursor.execute(
+        f'INSERT INTO {posters} (group_id, author_id, rank, post_count) '
+        f'SELECT group_id, author_id, position, total FROM ('
+        f'SELECT group_id, author_id, COUNT(*) AS total, ROW_NUMBER() OVER ('
+        f'PARTITION BY group_id ORDER BY COUNT(*) DESC, author_id'
+        f') AS position '
+        f'FROM {post} WHERE group_id IS NOT NULL '
+        f'GROUP BY group_id, author_id) ranked '
+        f'WHERE position <= %s',
+        [limit])
+    return cursor.rowcount
+
+
+def refresh(limit=None):
+    """Пересчитывает лучших авторов всех групп.
+
+    Возвращает число сохранённых строк GroupPoster.
+    """
+    limit = limit or top_posters_shown()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            saved = _refresh_posters(cursor, limit)
+    feed_cache.bump(feed_cache.GROUPS_SCOPE)
+    return saved
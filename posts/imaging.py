@@ -0,0 +1,93 @@
+"""Обработка изображений без обращения к Django.
+
+Функции модуля выполняются в дочерних процессах пула из
+posts.thumbnails, поэтому принимают только пути к файлам.
+"""
+import os
+import shutil
+
+from PIL import Image, ImageOps
+
+
+SAVE_OPTIONS = {
+    'AVIF': {'quality': 60},
+    'WEBP': {'quality': 80, 'method': 4},
+    'JPEG': {'quality': 85, 'progressive': True, 'optimize': True},
+}
+
+
+def supported_formats(formats):
+    """Форматы из ``formats``, которые установленный Pillow умеет писать."""
+    Image.init()
+    return [image_format for image_format in formats
+            if image_format in Image.SAVE]
+
+
+def render_variants(source_path, variants):
+    """Создаёт варианты изображения, декодируя оригинал один раз.
+
+    ``variants`` — список ``(target_path, (width, height), format)``.
+    Файлы пишутся по порядку, поэтому последний вариант появляется на
+    диске только когда готовы все остальные.
+    """
+    pending = [variant for variant in variants
+               if not os.path.exists(variant[0])]
+    if not pending:
+        return []
+    largest = max(size for _, size, _ in pending)
+    with Image.open(source_path) as image:
+        image.draft('RGB', largest)
+        image = image.convert('RGB')
+    for target_path, size, image_format in pending:
+        variant = ImageOps.fit(image, size, method=Image.LANCZOS)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        partial_path = f'{target_path}.{os.getpid()}.part'
+        variant.save(partial_path, image_format,
+                     **SAVE_OPTIONS.get(image_format, {}))
+        os.replace(partial_path, target_path)
+    return [target_path for target_path, _, _ in pending]
+
+
+def read_image_header(source):
+    """Возвращает ((width, height), размер Exif), читая только заголовок.
+
+    ``source`` — путь или файловый объект; Pillow при открытии разбирает
+    заголовок и не декодирует пиксели.
+    """
+    with Image.open(source) as image:
+        return image.size, len(image.info.get('exif', b''))
+
+
+def strip_jpeg_exif(source, target, chunk_size=64 * 1024):
+    """Потоково копирует JPEG из ``source`` в ``target`` без Exif (APP1).
+
+    Пиксельные данные не перекодируются. Для не-JPEG и повреждённых
+    файлов бросает ValueError.
+    """
+    if source.read(2) != b'\xff\xd8':
+        raise ValueError('not a JPEG file')
+    target.write(b'\xff\xd8')
+    while True:
+        marker = source.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError('broken JPEG marker')
+        if marker[1] in (0xDA, 0xD9):
+            target.write(marker)
+            break
+        length_bytes = source.read(2)
+        if len(length_bytes) < 2:
+            raise ValueError('broken JPEG segment')
+        length = int.from_bytes(length_bytes, 'big') - 2
+        payload_start = source.read(min(6, length))
+        if marker[1] == 0xE1 and payload_start == b'Exif\x00\x00':
+            source.seek(length - len(payload_start), os.SEEK_CUR)
+            continue
+        target.write(marker + length_bytes + payload_start)
+        remaining = length - len(payload_start)
+        while remaining > 0:
+            chunk = source.read(min(chunk_size, remaining))
+            if not chunk:
+                raise ValueError('truncated JPEG segment')
+            target.write(chunk)
+            remaining -= len(chunk)
+    shutil.copyfileobj(source, target, chunk_size)
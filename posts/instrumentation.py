@@ -0,0 +1,140 @@
+"""Замеры стоимости запроса: SQL, шаблоны, кеш лент и миниатюры.
+
+Метрики копятся в RequestMetrics текущего запроса. Для запросов, не
+попавших в выборку POSTS_INSTRUMENTATION_SAMPLE_RATE, объект не
+создаётся, и count()/timer() ничего не делают.
+"""
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('posts_request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = Counter()
+        self.counts = Counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.elapsed() * 1000, 2),
+            'queries': self.counts['queries'],
+            'db_ms': round(self.durations['db'] * 1000, 2),
+            'template_ms': round(self.durations['template'] * 1000, 2),
+            'cache_hits': (self.counts['cache_hits']
+                           + self.counts['cache_stale']),
+            'cache_misses': self.counts['cache_misses'],
+            'thumbnail_ms': round(self.durations['thumbnail'] * 1000, 2),
+        }
+
+
+def count(name, value=1):
+    metrics = current.get()
+    if metrics is not None:
+        metrics.counts[name] += value
+
+
+@contextmanager
+def timer(name):
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - started
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    count('queries')
+    with timer('db'):
+        return execute(sql, params, many, context)
+
+
+def server_timing(values):
+    return ', '.join([
+        f'total;dur={values["total_ms"]}',
+        f'db;dur={values["db_ms"]};desc="{values["queries"]} queries"',
+        f'tpl;dur={values["template_ms"]}',
+        f'cache;desc="{values["cache_hits"]} hits / '
+        f'{values["cache_misses"]} misses"',
+        f'thumb;dur={values["thumbnail_ms"]}',
+    ])
+
+
+class InstrumentationMiddleware:
+    """Для выборки запросов пишет метрики в заголовок Server-Timing и в
+    журнал ``posts.instrumentation`` строкой вида ``ключ=значение``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'POSTS_INSTRUMENTATION_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+
+        values = metrics.as_dict()
+        response['Server-Timing'] = server_timing(values)
+        match = getattr(request, 'resolver_match', None)
+        line = {'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else '-',
+                'status': response.status_code,
+                **values}
+        message = ' '.join(f'{key}={value}' for key, value in line.items())
+        logger.info(message, extra={'metrics': line})
+        return response
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return super().render(context, request)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """DjangoTemplates, засекающий время отрисовки шаблона верхнего
+    уровня; вложенные include уже входят в него."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name),
+                                 self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
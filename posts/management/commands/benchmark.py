@@ -0,0 +1,66 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p95/p99 задержки, число запросов и память '
+            'основных страниц. Создаёт комментарии, поэтому запускать '
+            'только на базе для замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--views', nargs='+', choices=benchmark.VIEWS,
+                            default=benchmark.VIEWS)
+        parser.add_argument('--cold', action='store_true',
+                            help='очищать кеш перед каждым запросом')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            help='файл отчёта, по умолчанию '
+                                 'benchmarks/<время>.json')
+        parser.add_argument('--compare',
+                            help='отчёт, с которым сравнить результаты')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='допустимый рост p95 в процентах')
+
+    def handle(self, *args, **options):
+        runner = benchmark.Benchmark(requests=options['requests'],
+                                     seed=options['seed'],
+                                     cold=options['cold'])
+        try:
+            report = runner.run(options['views'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        for view, result in report['results'].items():
+            self.stdout.write(
+                f'{view:<14} p50 {result["p50_ms"]:>9.2f} мс  '
+                f'p95 {result["p95_ms"]:>9.2f} мс  '
+                f'p99 {result["p99_ms"]:>9.2f} мс  '
+                f'запросов {result["queries"]:>3}  '
+                f'память {result["peak_memory_kb"]:>8.1f} КБ'
+            )
+
+        output = options['output']
+        if output is None:
+            os.makedirs('benchmarks', exist_ok=True)
+            output = os.path.join(
+                'benchmarks', report['created'].replace(':', '-') + '.json')
+        benchmark.save(report, output)
+        self.stdout.write(f'Отчёт сохранён в {output}')
+
+        if options['compare']:
+            rows = benchmark.compare(benchmark.load(options['compare']),
+                                     report, options['threshold'])
+            regressions = []
+            for view, before, after, change, regressed in rows:
+                mark = ' РЕГРЕССИЯ' if regressed else ''
+                self.stdout.write(f'{view:<14} p95 {before:.2f} -> '
+                                  f'{after:.2f} мс ({change:+.1f}%){mark}')
+                if regressed:
+                    regressions.append(view)
+            if regressions:
+                raise CommandError('Рост p95 выше порога: '
+                                   + ', '.join(regressions))
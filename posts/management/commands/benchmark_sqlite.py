@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite с настройками по '
+            'умолчанию и с прагмами из DATABASES при нескольких писателях')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--output', help='сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        tuned = {key: value
+                 for key, value in settings.DATABASES['default'].items()
+                 if key in ('PRAGMAS', 'IMMEDIATE_TRANSACTIONS')}
+        profiles = (
+            ('default', 'django.db.backends.sqlite3', {}),
+            ('tuned', 'yatube.db.backends.sqlite3', tuned),
+        )
+        report = {}
+        for name, engine, extra in profiles:
+            result = benchmark.sqlite_throughput(
+                engine,
+                writers=options['writers'],
+                readers=options['readers'],
+                duration=options['duration'],
+                options=extra,
+            )
+            report[name] = result
+            self.stdout.write(
+                f'{name:<8} запись {result["writes_per_second"]:>9.1f}/с '
+                f'(ошибок {result["write_errors"]}), '
+                f'чтение {result["reads_per_second"]:>9.1f}/с '
+                f'(ошибок {result["read_errors"]})'
+            )
+        if options['output']:
+            benchmark.save(report, options['output'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import build
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает предложения подписок: друзья друзей и '
+            'активные авторы общих групп')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='пользователей в одной пачке')
+        parser.add_argument('--top-k', type=int,
+                            help='предложений на пользователя')
+        parser.add_argument('--posters-per-group', type=int, default=50)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        for last_pk, saved in build(
+                chunk_size=options['chunk_size'],
+                limit=options['top_k'],
+                posters_per_group=options['posters_per_group']):
+            total += saved
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Пользователи до id {last_pk}: {saved}')
+        self.stdout.write(f'Сохранено предложений: {total} за '
+                          f'{time.perf_counter() - started:.1f} с')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.explain import feed_queries, problems
+
+
+class Command(BaseCommand):
+    help = ('Печатает планы выполнения (EXPLAIN) запросов лент и отмечает '
+            'полные просмотры таблиц и сортировки без индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='выполнить запросы (только PostgreSQL)')
+        parser.add_argument('--format', help='формат плана, например json')
+        parser.add_argument('--sql', action='store_true',
+                            help='печатать и сам SQL')
+        parser.add_argument('--only', nargs='+', metavar='NAME',
+                            help='только перечисленные запросы')
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            explain_options.update(analyze=True, buffers=True)
+        queries = [(name, queryset) for name, queryset in feed_queries()
+                   if not options['only'] or name in options['only']]
+        flagged = 0
+        for name, queryset in queries:
+            try:
+                plan = queryset.explain(format=options['format'],
+                                        **explain_options)
+            except ValueError as error:
+                raise CommandError(error)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {name}'))
+            if options['sql']:
+                self.stdout.write(str(queryset.query))
+            self.stdout.write(plan)
+            found = problems(plan, connection.vendor)
+            for line in found:
+                self.stdout.write(self.style.WARNING(f'!! {line}'))
+            flagged += bool(found)
+        self.stdout.write(f'Запросов: {len(queries)}, '
+                          f'с полным просмотром или сортировкой: {flagged}')
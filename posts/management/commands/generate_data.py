@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.datagen import DataGenerator
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу большим набором пользователей, подписок, '
+            'публикаций и комментариев для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--follows', type=int, default=200000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=500000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='за сколько дней разбросать публикации')
+        parser.add_argument('--prefix', default='bench',
+                            help='префикс имён пользователей и групп')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = DataGenerator(prefix=options['prefix'],
+                                  seed=options['seed'],
+                                  batch_size=options['batch_size'],
+                                  days=options['days'],
+                                  log=self.stdout.write)
+        with transaction.atomic():
+            generator.generate(users=options['users'],
+                               groups=options['groups'],
+                               follows=options['follows'],
+                               posts=options['posts'],
+                               comments=options['comments'])
@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.imaging import render_variants
+from posts.models import Post
+from posts.thumbnails import thumbnail_job
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры для изображений публикаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.POSTS_THUMBNAIL_WORKERS)
+
+    def handle(self, *args, **options):
+        images = (Post.objects.exclude(image='').exclude(image__isnull=True)
+                  .values_list('image', flat=True))
+        jobs = []
+        for image_name in images.iterator():
+            job = thumbnail_job(image_name)
+            if not all(os.path.exists(path) for path, _, _ in job[1]):
+                jobs.append(job)
+
+        created = failed = 0
+        if options['workers']:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            with executor:
+                futures = [executor.submit(render_variants, *job)
+                           for job in jobs]
+                for future in as_completed(futures):
+                    if future.exception() is None:
+                        created += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(str(future.exception()))
+        else:
+            for job in jobs:
+                try:
+                    render_variants(*job)
+                    created += 1
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(str(error))
+        self.stdout.write(f'Создано миниатюр: {created}, ошибок: {failed}')
@@ -0,0 +1,61 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import BATCH_SIZE, import_edges
+
+
+class Command(BaseCommand):
+    help = ('Импортирует граф подписок из CSV со столбцами "подписчик,автор" '
+            'пачками по транзакции на пачку')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл CSV или "-" для stdin')
+        parser.add_argument('--ids', action='store_true',
+                            help='в файле id пользователей, а не имена')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--skip-header', action='store_true')
+
+    def rows(self, source, options):
+        reader = csv.reader(source, delimiter=options['delimiter'])
+        if options['skip_header']:
+            next(reader, None)
+        for line, row in enumerate(reader, start=1):
+            if not row:
+                continue
+            if len(row) != 2:
+                raise CommandError(f'Строка {line}: ожидалось два столбца')
+            yield row[0].strip(), row[1].strip()
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            source = sys.stdin
+        else:
+            source = open(options['path'], encoding='utf-8', newline='')
+        processed = created = 0
+        unknown = set()
+        started = time.perf_counter()
+        try:
+            for count, new, missing in import_edges(
+                    self.rows(source, options),
+                    batch_size=options['batch_size'],
+                    usernames=not options['ids']):
+                processed += count
+                created += new
+                unknown |= missing
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Обработано пар: {processed}')
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f'Обработано пар: {processed}, новых подписок: {created}, '
+            f'неизвестных пользователей: {len(unknown)}, '
+            f'{rate:.0f} пар/с')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Пачками перестраивает поисковый индекс публикаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='продолжить после публикации с этим id')
+        parser.add_argument('--missing', action='store_true',
+                            help='только публикации без записей в индексе')
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for last_pk, count in rebuild_index(
+                batch_size=options['batch_size'],
+                start_after=options['start_after'],
+                missing_only=options['missing']):
+            indexed += count
+            self.stdout.write(f'Проиндексировано до id {last_pk}')
+        self.stdout.write(f'Проиндексировано публикаций: {indexed}')
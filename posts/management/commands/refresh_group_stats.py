@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.groups import recount_activity, refresh
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает самых активных авторов групп; запускается раз '
+            'в несколько минут')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int,
+                            help='авторов на группу')
+        parser.add_argument('--activity', action='store_true',
+                            help='заодно пересчитать время активности всех '
+                                 'групп, например после массового импорта')
+
+    def handle(self, *args, **options):
+        saved = refresh(limit=options['top'])
+        if options['activity']:
+            recount_activity()
+        self.stdout.write(f'Сохранено авторов групп: {saved}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repaired = repair_counters(batch_size=options['batch_size'])
+        for counter, fixed in repaired.items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import rebuild, roll
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает популярность публикаций и групп с затуханием и '
+            'удаляет устаревшие часовые корзины; запускается раз в час')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='заново разложить комментарии и публикации '
+                                 'окна по корзинам')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild()
+            self.stdout.write('Корзины разложены заново')
+        else:
+            roll()
+        self.stdout.write('Популярность пересчитана')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import get_timeline_store
+
+
+class Command(BaseCommand):
+    help = ('Переводит авторов, перешедших порог подписчиков, между '
+            'раскладкой по лентам и подтягиванием при чтении; запускается '
+            'раз в несколько минут')
+
+    def handle(self, *args, **options):
+        promoted, demoted = get_timeline_store().sync()
+        self.stdout.write(f'Переведено в подтягивание: {promoted}, '
+                          f'возвращено к раскладке: {demoted}')
@@ -0,0 +1,66 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count(model, field, outer='pk'):
+    rows = (model.objects.filter(**{field: OuterRef(outer)})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True).iterator()],
+    )
+    UserStats.objects.update(
+        follower_count=count(Follow, 'author', 'user_id'),
+        following_count=count(Follow, 'user', 'user_id'),
+        post_count=count(Post, 'author', 'user_id'),
+    )
+    Group.objects.update(post_count=count(Post, 'group'))
+    Post.objects.update(comment_count=count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0014_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('follower_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Публикаций')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число публикаций'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
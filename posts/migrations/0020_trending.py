@@ -0,0 +1,63 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Начало часа')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Публикаций')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-trending_score', '-id'], name='group_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='trendingbucket',
+            name='group',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AddField(
+            model_name='trendingbucket',
+            name='post',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Публикация'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingbucket',
+            index=models.Index(fields=['hour'], name='trending_bucket_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.UniqueConstraint(fields=('post', 'hour'), name='unique_post_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.UniqueConstraint(fields=('group', 'hour'), name='unique_group_bucket'),
+        ),
+    ]
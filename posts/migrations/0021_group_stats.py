@@ -0,0 +1,47 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0020_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupPoster',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Публикаций')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='last_activity',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Последняя активность'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-last_activity', '-id'], name='group_activity_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupposter',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AddField(
+            model_name='groupposter',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='top_posters', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupposter',
+            constraint=models.UniqueConstraint(fields=('group', 'rank'), name='unique_group_poster_rank'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    threshold = getattr(settings, 'POSTS_TIMELINE_CELEBRITY_FOLLOWERS', 1000)
+    UserStats.objects.filter(follower_count__gte=threshold).update(
+        pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_timeline_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='Публикации подтягиваются при чтении'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
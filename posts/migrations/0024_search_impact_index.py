@@ -0,0 +1,17 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_userstats_pulled'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='searchtoken',
+            index=models.Index(fields=['term', '-count', '-post'], name='search_token_impact_idx'),
+        ),
+    ]
@@ -1,10 +1,39 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
 
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+
+    def with_feed_data(self):
+        """Подгружает всё, что нужно карточке публикации, одним запросом."""
+        return self.select_related('author', 'group')
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            comments = delete_comments(self.values('pk'), self.db)
+            return add_deleted(super().delete(), comments)
+
+
+def delete_comments(posts, using):
+    """Удаляет комментарии публикаций ``posts`` одним запросом.
+
+    Без этого Collector при удалении публикации загрузил бы все её
+    комментарии и отправил бы сигналы по каждому, хотя счётчик и лента
+    удаляемой публикации больше не нужны.
+    """
+    return Comment.objects.filter(post__in=posts)._raw_delete(using)
+
+
+def add_deleted(result, comments):
+    total, rows = result
+    if comments:
+        rows[Comment._meta.label] = comments
+    return total + comments, rows
+
+
 class Group(models.Model):
 
     title = models.CharField(max_length=200,
@@ -13,6 +42,24 @@ class Group(models.Model):
                             max_length=79,
                             verbose_name='Slug группы')
     description = models.TextField(verbose_name='Описание группы')
+    post_count = models.PositiveIntegerField(default=0,
+                                             editable=False,
+                                             verbose_name='Число публикаций')
+    trending_score = models.FloatField(default=0,
+                                       editable=False,
+                                       verbose_name='Популярность')
+    last_activity = models.DateTimeField(
+        null=True,
+        editable=False,
+        verbose_name='Последняя активность')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending_score', '-id'],
+                         name='group_trending_idx'),
+            models.Index(fields=['-last_activity', '-id'],
+                         name='group_activity_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -23,8 +70,9 @@ class Post(models.Model):
     text = models.TextField(verbose_name='Текст публикации',
                             help_text='Введите текст публикации')
     pub_date = models.DateTimeField(verbose_name='Дата публикации',
-                                    auto_now_add=True,
-                                    db_index=True)
+                                    auto_now_add=True)
+    updated = models.DateTimeField(verbose_name='Дата изменения',
+                                   auto_now=True)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='posts',
@@ -40,13 +88,40 @@ class Post(models.Model):
                               blank=True,
                               null=True,
                               verbose_name='Изображение')
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев')
+    trending_score = models.FloatField(default=0,
+                                       editable=False,
+                                       verbose_name='Популярность')
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # Ленты сортируются по (-pub_date, -id), см. CursorPaginator.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='post_trending_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(Post, instance=self)
+        with transaction.atomic(using=using):
+            comments = delete_comments([self.pk], using)
+            return add_deleted(super().delete(using, keep_parents),
+                               comments)
+
 
 class Comment(models.Model):
 
@@ -63,6 +138,12 @@ class Comment(models.Model):
     text = models.TextField(verbose_name='Текст публикации',
                             help_text='Введите текст публикации')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
 
@@ -81,3 +162,169 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follow')
         ]
+        # Подписчики автора читаются только из индекса.
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись персональной ленты подписок, заполняется при публикации."""
+
+    user = models.ForeignKey(User,
+                             related_name='timeline',
+                             on_delete=models.CASCADE,
+                             verbose_name='Владелец ленты')
+    author = models.ForeignKey(User,
+                               related_name='+',
+                               on_delete=models.CASCADE,
+                               verbose_name='Автор публикации')
+    post = models.ForeignKey(Post,
+                             related_name='timeline_entries',
+                             on_delete=models.CASCADE,
+                             verbose_name='Публикация')
+    # Копия Post.pub_date: лента листается по индексу этой таблицы.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаются сигналами из posts.signals."""
+
+    user = models.OneToOneField(User,
+                                primary_key=True,
+                                related_name='stats',
+                                on_delete=models.CASCADE,
+                                verbose_name='Пользователь')
+    follower_count = models.PositiveIntegerField(default=0,
+                                                 db_index=True,
+                                                 verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='Подписок')
+    post_count = models.PositiveIntegerField(default=0,
+                                             verbose_name='Публикаций')
+    pulled = models.BooleanField(
+        default=False,
+        verbose_name='Публикации подтягиваются при чтении')
+
+
+class SearchToken(models.Model):
+    """Запись обратного индекса: слово и число его вхождений в публикацию."""
+
+    term = models.CharField(max_length=64,
+                            verbose_name='Слово')
+    post = models.ForeignKey(Post,
+                             related_name='search_tokens',
+                             on_delete=models.CASCADE,
+                             verbose_name='Публикация')
+    count = models.PositiveIntegerField(default=1,
+                                        verbose_name='Число вхождений')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'post'],
+                                    name='unique_search_token')
+        ]
+        # Выдача по слову читается по убыванию числа вхождений.
+        indexes = [
+            models.Index(fields=['term', '-count', '-post'],
+                         name='search_token_impact_idx'),
+        ]
+
+
+class Recommendation(models.Model):
+    """Предложение подписки, пересчитывается командой
+    build_recommendations."""
+
+    user = models.ForeignKey(User,
+                             related_name='recommendations',
+                             on_delete=models.CASCADE,
+                             verbose_name='Кому')
+    candidate = models.ForeignKey(User,
+                                  related_name='+',
+                                  on_delete=models.CASCADE,
+                                  verbose_name='Кого предложить')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+    score = models.FloatField(verbose_name='Оценка')
+    mutual_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Общих подписок')
+    shared_groups = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Общих групп')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'],
+                                    name='unique_recommendation_rank')
+        ]
+
+
+class TrendingBucket(models.Model):
+    """Число комментариев и публикаций за час по публикации или группе.
+
+    Строка относится либо к публикации, либо к группе; старые корзины
+    удаляет команда roll_trending.
+    """
+
+    post = models.ForeignKey(Post,
+                             related_name='+',
+                             on_delete=models.CASCADE,
+                             null=True,
+                             verbose_name='Публикация')
+    group = models.ForeignKey(Group,
+                              related_name='+',
+                              on_delete=models.CASCADE,
+                              null=True,
+                              verbose_name='Группа')
+    hour = models.DateTimeField(verbose_name='Начало часа')
+    comments = models.PositiveIntegerField(default=0,
+                                           verbose_name='Комментариев')
+    posts = models.PositiveIntegerField(default=0,
+                                        verbose_name='Публикаций')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'hour'],
+                                    name='unique_post_bucket'),
+            models.UniqueConstraint(fields=['group', 'hour'],
+                                    name='unique_group_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='trending_bucket_hour_idx'),
+        ]
+
+
+class GroupPoster(models.Model):
+    """Самый активный автор группы и его место, пересчитывается командой
+    refresh_group_stats."""
+
+    group = models.ForeignKey(Group,
+                              related_name='top_posters',
+                              on_delete=models.CASCADE,
+                              verbose_name='Группа')
+    author = models.ForeignKey(User,
+                               related_name='+',
+                               on_delete=models.CASCADE,
+                               verbose_name='Автор')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+    post_count = models.PositiveIntegerField(default=0,
+                                             verbose_name='Публикаций')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'rank'],
+                                    name='unique_group_poster_rank')
+        ]
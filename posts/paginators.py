@@ -0,0 +1,189 @@
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+PAGE_SIZE = 10
+COMMENTS_PAGE_SIZE = 50
+TRENDING_SIZE = 100
+
+
+def encode_cursor(instance, field='pub_date'):
+    value = getattr(instance, field)
+    raw = f'{value.isoformat() if value is not None else ""}|{instance.pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token, nullable=False):
+    """Возвращает пару (дата, id) или None для битого токена.
+
+    При ``nullable`` пустая дата в токене даёт пару (None, id).
+    """
+    try:
+        value, pk = force_str(urlsafe_base64_decode(token)).split('|')
+        pk = int(pk)
+        if nullable and not value:
+            return None, pk
+        value = parse_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def keyset_filter(field, value, pk, older=True, nullable=False):
+    """Условие на записи за ключом (value, pk) в порядке убывания
+    (``older``) или возрастания ``field`` и id.
+
+    При ``nullable`` записи с NULL идут там же, где их ставит база:
+    в конце убывающего порядка в SQLite и в начале в PostgreSQL.
+    """
+    compare = 'lt' if older else 'gt'
+    nulls_older = not connection.features.nulls_order_largest
+    if value is None:
+        condition = Q(**{f'{field}__isnull': True, f'pk__{compare}': pk})
+        if nulls_older != older:
+            condition |= Q(**{f'{field}__isnull': False})
+        return condition
+    condition = (Q(**{f'{field}__{compare}': value})
+                 | Q(**{field: value, f'pk__{compare}': pk}))
+    if nullable and nulls_older == older:
+        condition |= Q(**{f'{field}__isnull': True})
+    return condition
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница задаётся непрозрачными токенами ``after`` (более старые
+    записи) и ``before`` (более новые записи). Вместо pub_date можно
+    листать по другому полю-дате ``field``, в том числе допускающему
+    NULL.
+    """
+
+    def __init__(self, queryset, per_page=PAGE_SIZE, field='pub_date'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    @property
+    def nullable(self):
+        model = getattr(self.queryset, 'model', None)
+        return model is not None and model._meta.get_field(self.field).null
+
+    def page_queryset(self, after=None, before=None):
+        """Запрос страницы с запасом в одну запись для признака продолжения.
+
+        ``after`` и ``before`` - уже разобранные пары (дата, id); для
+        ``before`` записи идут в обратном порядке. Источник, у которого
+        есть собственный keyset_page(), например лента подписок, читает
+        страницу сам.
+        """
+        keyset_page = getattr(self.queryset, 'keyset_page', None)
+        if keyset_page is not None:
+            return keyset_page(after, before, self.per_page + 1)
+        field = self.field
+        if after is not None:
+            return self.queryset.filter(
+                keyset_filter(field, *after, nullable=self.nullable)
+            ).order_by(f'-{field}', '-pk')[:self.per_page + 1]
+        if before is not None:
+            return self.queryset.filter(
+                keyset_filter(field, *before, older=False,
+                              nullable=self.nullable)
+            ).order_by(field, 'pk')[:self.per_page + 1]
+        return self.queryset.order_by(f'-{field}', '-pk')[:self.per_page + 1]
+
+    def get_page(self, after=None, before=None):
+        after = decode_cursor(after, self.nullable) if after else None
+        before = decode_cursor(before, self.nullable) if before else None
+        rows = list(self.page_queryset(after, before))
+        if after is not None:
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = True
+        elif before is not None:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = False
+
+        return self.make_page(
+            rows,
+            next_cursor=(encode_cursor(rows[-1], self.field)
+                         if has_next and rows else None),
+            previous_cursor=(encode_cursor(rows[0], self.field)
+                             if has_previous and rows else None),
+        )
+
+    def make_page(self, rows, next_cursor=None, previous_cursor=None):
+        page = Page(rows, None, self)
+        page.is_cursor = True
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+
+def paginate(request, queryset, per_page=PAGE_SIZE):
+    """Возвращает (page, paginator) для ленты.
+
+    По умолчанию используется курсорная пагинация, ссылки вида
+    ``?page=N`` обслуживаются обычным Paginator.
+    """
+    paginator = Paginator(queryset, per_page)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number), paginator
+    page = CursorPaginator(queryset, per_page).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return page, paginator
+
+
+def paginate_ranked(request, fetch, per_page=PAGE_SIZE, limit=None):
+    """Страница ранжированной выдачи, например поиска, без COUNT.
+
+    ``fetch(offset, count)`` отдаёт до ``count`` записей с места
+    ``offset``. Курсоры ``after`` и ``before`` - места начала следующей
+    и конца предыдущей страницы; о продолжении говорит одна лишняя
+    запись. ``limit`` ограничивает глубину выдачи.
+    """
+    try:
+        if request.GET.get('before'):
+            offset = int(request.GET['before']) - per_page
+        else:
+            offset = int(request.GET.get('after') or 0)
+    except ValueError:
+        offset = 0
+    offset = max(0, offset)
+    if limit is not None:
+        offset = min(offset, limit)
+    rows = fetch(offset, per_page + 1)
+    next_offset = offset + per_page
+    has_next = (len(rows) > per_page
+                and (limit is None or next_offset < limit))
+    return CursorPaginator(None, per_page).make_page(
+        rows[:per_page],
+        next_cursor=str(next_offset) if has_next else None,
+        previous_cursor=str(offset) if offset else None,
+    )
+
+
+def comments_after(comments, after=None):
+    """Комментарии по возрастанию (created, id) с авторами, начиная после
+    курсора ``after``; битый курсор означает первую страницу."""
+    comments = comments.select_related('author').order_by('created', 'pk')
+    after = decode_cursor(after) if after else None
+    if after is not None:
+        created, pk = after
+        comments = comments.filter(Q(created__gt=created)
+                                   | Q(created=created, pk__gt=pk))
+    return comments
@@ -0,0 +1,134 @@
+"""Предложения подписок: друзья друзей и соседи по группам.
+
+Пересчёт идёт пачками пользователей целиком в базе. Число общих
+подписок - это произведение разреженной матрицы подписок на саму себя,
+то есть соединение Follow с собой с группировкой. Соседи по группам -
+самые активные авторы групп, в которых пользователь публиковал. Для
+каждого пользователя сохраняются лучшие POSTS_RECOMMENDATIONS_TOP_K
+кандидатов, и страница читает их одним запросом по индексу.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from . import feed_cache
+from .models import Follow, Post, Recommendation
+
+
+User = get_user_model()
+
+MUTUAL_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+POSTERS_TABLE = 'posts_recommendation_posters'
+
+
+def top_k():
+    return getattr(settings, 'POSTS_RECOMMENDATIONS_TOP_K', 20)
+
+
+def suggestions(user, limit=None):
+    """Лучшие предложения для ``user`` без уже оформленных подписок."""
+    limit = limit or getattr(settings, 'POSTS_RECOMMENDATIONS_SHOWN', 5)
+    followed = Follow.objects.filter(user=user).values('author_id')
+    return (Recommendation.objects.filter(user=user)
+            .exclude(candidate_id__in=followed)
+            .select_related('candidate')
+            .order_by('rank')[:limit])
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return {
+        'follow': quote(Follow._meta.db_table),
+        'post': quote(Post._meta.db_table),
+        'recommendation': quote(Recommendation._meta.db_table),
+        'posters': quote(POSTERS_TABLE),
+    }
+
+
+def _create_posters(cursor, per_group):
+    """Временная таблица: до ``per_group`` самых активных авторов группы."""
+    tables = _tables()
+    cursor.execute(f'DROP TABLE IF EXISTS {tables["posters"]}')
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE {tables["posters"]} AS '
+        f'SELECT group_id, author_id FROM ('
+        f'SELECT group_id, author_id, ROW_NUMBER() OVER ('
+        f'PARTITION BY group_id ORDER BY COUNT(*) DESC, author_id'
+        f') AS position '
+        f'FROM {tables["post"]} WHERE group_id IS NOT NULL '
+        f'GROUP BY group_id, author_id) ranked '
+        f'WHERE position <= %s',
+        [per_group])
+    cursor.execute(f'CREATE INDEX {POSTERS_TABLE}_group '
+                   f'ON {tables["posters"]} (group_id, author_id)')
+
+
+def _build_chunk(cursor, low, high, limit):
+    tables = _tables()
+    score = 'SUM(mutual) * %s + SUM(shared) * %s'
+    cursor.execute(
+        f'DELETE FROM {tables["recommendation"]} '
+        f'WHERE user_id BETWEEN %s AND %s', [low, high])
+    cursor.execute(
+        f'INSERT INTO {tables["recommendation"]} '
+        f'(user_id, candidate_id, rank, score, mutual_count, shared_groups) '
+        f'SELECT user_id, candidate_id, position, score, mutual, shared '
+        f'FROM ('
+        f'SELECT user_id, candidate_id, {score} AS score, '
+        f'SUM(mutual) AS mutual, SUM(shared) AS shared, '
+        f'ROW_NUMBER() OVER (PARTITION BY user_id '
+        f'ORDER BY {score} DESC, candidate_id) AS position '
+        f'FROM ('
+        # Друзья друзей: u -> w -> c.
+        f'SELECT f1.user_id AS user_id, f2.author_id AS candidate_id, '
+        f'COUNT(*) AS mutual, 0 AS shared '
+        f'FROM {tables["follow"]} f1 '
+        f'INNER JOIN {tables["follow"]} f2 ON f2.user_id = f1.author_id '
+        f'WHERE f1.user_id BETWEEN %s AND %s '
+        f'AND f2.author_id <> f1.user_id '
+        f'GROUP BY f1.user_id, f2.author_id '
+        f'UNION ALL '
+        # Соседи по группам: активные авторы групп, где публиковал u.
+        f'SELECT own.author_id, p.author_id, 0, COUNT(*) '
+        f'FROM (SELECT DISTINCT author_id, group_id FROM {tables["post"]} '
+        f'WHERE group_id IS NOT NULL AND author_id BETWEEN %s AND %s) own '
+        f'INNER JOIN {tables["posters"]} p ON p.group_id = own.group_id '
+        f'WHERE p.author_id <> own.author_id '
+        f'GROUP BY own.author_id, p.author_id'
+        f') pairs '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {tables["follow"]} f '
+        f'WHERE f.user_id = pairs.user_id '
+        f'AND f.author_id = pairs.candidate_id) '
+        f'GROUP BY user_id, candidate_id'
+        f') ranked '
+        f'WHERE position <= %s',
+        [MUTUAL_WEIGHT, GROUP_WEIGHT, MUTUAL_WEIGHT, GROUP_WEIGHT,
+         low, high, low, high, limit])
+    return cursor.rowcount
+
+
+def build(chunk_size=1000, limit=None, posters_per_group=50):
+    """Пересчитывает предложения пачками по ``chunk_size`` пользователей.
+
+    Генератор: после каждой пачки отдаёт (последний id пользователя,
+    число сохранённых предложений).
+    """
+    limit = limit or top_k()
+    last_pk = 0
+    with connection.cursor() as cursor:
+        _create_posters(cursor, posters_per_group)
+        try:
+            while True:
+                pks = list(User.objects.filter(pk__gt=last_pk)
+                           .order_by('pk')
+                           .values_list('pk', flat=True)[:chunk_size])
+                if not pks:
+                    break
+                with transaction.atomic():
+                    saved = _build_chunk(cursor, pks[0], pks[-1], limit)
+                last_pk = pks[-1]
+                yield last_pk, saved
+        finally:
+            cursor.execute(f'DROP TABLE IF EXISTS {_tables()["posters"]}')
+    feed_cache.bump(feed_cache.RECOMMENDATIONS_SCOPE)
@@ -0,0 +1,159 @@
+import hashlib
+import math
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Post, SearchToken
+
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 10
+MAX_RESULTS = 1000
+FREQUENCY_CACHE_TIMEOUT = 300
+
+
+def tokenize(text):
+    """Разбивает текст на нормализованные слова для индекса и запросов."""
+    text = text.casefold().replace('ё', 'е')
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(text)
+            if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def build_tokens(post):
+    return [SearchToken(term=term, post_id=post.pk, count=count)
+            for term, count in Counter(tokenize(post.text)).items()]
+
+
+def index_posts(posts):
+    """Переиндексирует публикации одной транзакцией."""
+    posts = list(posts)
+    tokens = [token for post in posts for token in build_tokens(post)]
+    with transaction.atomic():
+        SearchToken.objects.filter(
+            post_id__in=[post.pk for post in posts]).delete()
+        SearchToken.objects.bulk_create(tokens)
+    return len(tokens)
+
+
+def index_post(post):
+    return index_posts([post])
+
+
+def rebuild_index(batch_size=1000, start_after=0, missing_only=False):
+    """Переиндексирует публикации пачками по возрастанию id.
+
+    Каждая пачка фиксируется отдельно и отдаётся наружу как
+    (последний id, число публикаций), так что прерванную перестройку
+    можно продолжить с ``start_after``.
+    """
+    posts = Post.objects.order_by('pk').only('pk', 'text')
+    if missing_only:
+        posts = posts.filter(search_tokens__isnull=True)
+    last_pk = start_after
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        index_posts(batch)
+        last_pk = batch[-1].pk
+        yield last_pk, len(batch)
+
+
+def total_posts():
+    return cache.get_or_set('posts:search:total', Post.objects.count, 300)
+
+
+def frequency_key(term):
+    return 'posts:search:df:' + hashlib.md5(term.encode()).hexdigest()
+
+
+def document_frequencies(terms):
+    """Число публикаций с каждым словом.
+
+    Подсчёт по частому слову проходит все его записи индекса, поэтому
+    ненулевые значения кешируются на FREQUENCY_CACHE_TIMEOUT секунд.
+    Частоты нужны только для весов и выбора самого редкого слова, так
+    что небольшое отставание не мешает.
+    """
+    keys = {frequency_key(term): term for term in terms}
+    found = cache.get_many(keys)
+    frequencies = {keys[key]: total for key, total in found.items()}
+    missing = [term for term in terms if term not in frequencies]
+    if missing:
+        counted = dict(
+            SearchToken.objects.filter(term__in=missing)
+            .values('term').annotate(total=Count('pk'))
+            .values_list('term', 'total')
+        )
+        cache.set_many({frequency_key(term): total
+                        for term, total in counted.items()},
+                       FREQUENCY_CACHE_TIMEOUT)
+        frequencies.update(counted)
+    return {term: frequencies.get(term, 0) for term in terms}
+
+
+def candidates(terms):
+    """Записи индекса первого слова ``terms``, в публикациях которых есть
+    и остальные слова, по убыванию числа вхождений.
+
+    Это диапазон индекса search_token_impact_idx: срез [:n] обрывает
+    его после n подходящих записей без сортировки, поэтому первым
+    выгодно ставить самое редкое слово. Число вхождений остальных слов
+    приходит в аннотациях ``count_<номер>``.
+    """
+    first, *others = terms
+    postings = SearchToken.objects.filter(term=first)
+    for number, term in enumerate(others):
+        name = f'count_{number}'
+        counts = (SearchToken.objects
+                  .filter(term=term, post_id=OuterRef('post_id'))
+                  .values('count')[:1])
+        postings = (postings.annotate(**{name: Subquery(counts)})
+                    .filter(**{f'{name}__isnull': False}))
+    return postings.order_by('-count', '-post_id')
+
+
+def ranked_post_ids(query):
+    """Id публикаций, содержащих все слова запроса, по убыванию TF-IDF.
+
+    Оцениваются не больше MAX_RESULTS публикаций с наибольшим числом
+    вхождений самого редкого слова. Для запроса из одного слова это
+    точные лучшие результаты; для нескольких слов - приближение, зато
+    запрос читает ограниченный диапазон индекса, сколько бы публикаций
+    ни содержали частые слова.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    frequencies = document_frequencies(terms)
+    if not all(frequencies.values()):
+        return []
+    terms.sort(key=frequencies.get)
+    total = max(total_posts(), max(frequencies.values()))
+    weights = [math.log(1 + total / frequencies[term]) for term in terms]
+    names = [f'count_{number}' for number in range(len(terms) - 1)]
+    rows = (candidates(terms)
+            .values_list('post_id', 'count', *names)[:MAX_RESULTS])
+    scored = sorted(
+        ((sum(count * weight for count, weight in zip(counts, weights)),
+          post_id)
+         for post_id, *counts in rows),
+        reverse=True)
+    return [post_id for _, post_id in scored]
+
+
+def search_posts(query, queryset=None, offset=0, limit=None):
+    """Публикации из ``queryset`` по запросу, ``limit`` штук начиная с
+    места ``offset`` в выдаче ranked_post_ids()."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    ids = ranked_post_ids(query)
+    ids = ids[offset:None if limit is None else offset + limit]
+    posts = queryset.in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed_cache, follows, groups, trending
+from .counters import increment, increment_user
+from .models import Comment, Follow, Group, Post, UserStats
+from .search import index_post
+from .timeline import get_timeline_store
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        get_timeline_store().push(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        increment_user(instance.author_id, 'post_count')
+        if instance.group_id is not None:
+            groups.posted(instance.group_id, instance.pub_date)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            increment(Group, previous_group_id, 'post_count', -1)
+        if instance.group_id is not None:
+            increment(Group, instance.group_id, 'post_count')
+        # Публикация уносит с собой и свои комментарии.
+        groups.recount_activity([pk for pk in (previous_group_id,
+                                               instance.group_id)
+                                 if pk is not None])
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    increment_user(instance.author_id, 'post_count', -1)
+    if instance.group_id is not None:
+        increment(Group, instance.group_id, 'post_count', -1)
+        groups.forget_post(instance.group_id, instance.pub_date)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, created, update_fields, **kwargs):
+    # Записи индекса удаляются вместе с публикацией каскадом.
+    if update_fields is not None and 'text' not in update_fields:
+        return
+    index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def trend_post(sender, instance, created, **kwargs):
+    if created:
+        trending.record_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def trend_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.record_comment(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        increment(Post, instance.post_id, 'comment_count')
+
+
+@receiver(post_save, sender=Comment)
+def touch_comment_group(sender, instance, created, **kwargs):
+    if created and instance.post.group_id is not None:
+        groups.touch(instance.post.group_id, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    increment(Post, instance.post_id, 'comment_count', -1)
+
+
+@receiver(post_delete, sender=Comment)
+def forget_comment_group(sender, instance, **kwargs):
+    group_id = (Post.objects.filter(pk=instance.post_id)
+                .values_list('group_id', flat=True).first())
+    if group_id is not None:
+        groups.forget(group_id, instance.created)
+
+
+# Подписки через ORM (админка, Follow.objects.create) обновляются так
+# же, как через posts.follows.follow() и unfollow().
+@receiver(post_save, sender=Follow)
+def apply_follow(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def apply_unfollow(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    feed_cache.invalidate_post(instance, group_ids=(previous_group_id,))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        return
+    feed_cache.invalidate_post(post)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_all_feeds(sender, instance, **kwargs):
+    feed_cache.bump(feed_cache.ALL_SCOPE)
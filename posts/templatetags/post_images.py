@@ -0,0 +1,10 @@
+from django import template
+
+from posts.thumbnails import ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    return ready_thumbnail(image)
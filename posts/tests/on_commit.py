@@ -0,0 +1,20 @@
+"""Колбэки transaction.on_commit внутри TestCase.
+
+TestCase оборачивает каждый тест в транзакцию, которая откатывается,
+поэтому колбэки on_commit в нём никогда не выполняются. run_on_commit()
+выполняет те, что зарегистрированы внутри блока with, как
+captureOnCommitCallbacks(execute=True) в новых версиях Django.
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def run_on_commit():
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
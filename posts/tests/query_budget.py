@@ -0,0 +1,91 @@
+"""Ограничение числа SQL-запросов на каждый адрес из posts/urls.py.
+
+Бюджеты лежат в query_budgets.json рядом с этим модулем. Пока guard()
+активен, каждый запрос тестового клиента Django к адресу приложения
+posts проверяется на превышение бюджета; при провале в сообщение
+попадают самые частые повторяющиеся запросы, обычно это и есть N+1.
+"""
+import functools
+import json
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+DUPLICATES_SHOWN = 5
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def normalize(sql):
+    """Заменяет литералы на ``?``, чтобы одинаковые запросы совпали."""
+    return IN_LIST_RE.sub('IN (...)', LITERAL_RE.sub('?', sql))
+
+
+def duplicated(queries, limit=DUPLICATES_SHOWN):
+    counts = Counter(normalize(query['sql']) for query in queries)
+    return [(sql, total) for sql, total in counts.most_common(limit)
+            if total > 1]
+
+
+def report(path, url_name, queries, budget):
+    lines = [f'{path} ({url_name}): {len(queries)} SQL-запросов '
+             f'при бюджете {budget}']
+    for sql, total in duplicated(queries):
+        lines.append(f'  {total} x {sql}')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def guard(budgets=None):
+    """Проверяет бюджет каждого запроса тестового клиента."""
+    budgets = load_budgets() if budgets is None else budgets
+    original_request = Client.request
+
+    def request(client, **environ):
+        with CaptureQueriesContext(connection) as queries:
+            response = original_request(client, **environ)
+        try:
+            match = resolve(environ['PATH_INFO'])
+        except Resolver404:
+            return response
+        if match.app_name or match.url_name not in budgets:
+            return response
+        budget = budgets[match.url_name]
+        if len(queries) > budget:
+            raise AssertionError(report(environ['PATH_INFO'],
+                                        match.url_name, queries, budget))
+        return response
+
+    with mock.patch.object(Client, 'request', request):
+        yield
+
+
+def query_budget(test):
+    """Декоратор теста или класса тестов: включает guard() на время
+    каждого теста."""
+    if isinstance(test, type):
+        for name in dir(test):
+            if name.startswith('test'):
+                setattr(test, name, query_budget(getattr(test, name)))
+        return test
+
+    @functools.wraps(test)
+    def wrapper(*args, **kwargs):
+        with guard():
+            return test(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import COMMENTS_PAGE_SIZE, PAGE_SIZE
+from .on_commit import run_on_commit
+from .query_budget import query_budget
+
+User = get_user_model()
+
+
+@query_budget
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='panda',
+                                              first_name='Большая',
+                                              last_name='Панда')
+        cls.reader = User.objects.create_user(username='wolf')
+        cls.group = Group.objects.create(title='Бамбук', slug='bamboo',
+                                         description='Всё о бамбуке')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(PAGE_SIZE + 2):
+            cls.post = Post.objects.create(text=f'История {number}',
+                                           author=cls.author,
+                                           group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_index_walks_feed_with_cursors(self):
+        response = self.client.get(reverse('api_index'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertEqual(len(data['results']), PAGE_SIZE)
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+        self.assertEqual(data['results'][0]['author'], 'panda')
+        self.assertEqual(data['results'][0]['group'], 'bamboo')
+        self.assertIsNone(data['previous'])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual(len(rest['results']), 2)
+        self.assertIsNone(rest['next'])
+
+    def test_group_profile_and_post(self):
+        group = self.client.get(reverse('api_group_posts',
+                                        kwargs={'slug': 'bamboo'})).json()
+        self.assertEqual(group['group']['title'], 'Бамбук')
+        profile = self.client.get(reverse('api_profile',
+                                          kwargs={'username': 'panda'})).json()
+        self.assertEqual(profile['author'], {
+            'username': 'panda', 'full_name': 'Большая Панда',
+            'posts': PAGE_SIZE + 2, 'followers': 1, 'following': 0})
+        url = reverse('api_post', kwargs={'username': 'panda',
+                                          'post_id': self.post.pk})
+        detail = self.client.get(url).json()
+        self.assertEqual(detail['post']['text'], self.post.text)
+        self.assertEqual(detail['post']['url'], url)
+        self.assertEqual(detail['comments'], [])
+        self.assertIsNone(detail['comments_next'])
+
+    def test_post_comments_are_paginated(self):
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {number}', author=self.reader,
+                    post=self.post)
+            for number in range(COMMENTS_PAGE_SIZE + 1))
+        url = reverse('api_post', kwargs={'username': 'panda',
+                                          'post_id': self.post.pk})
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['comments']), COMMENTS_PAGE_SIZE)
+        second = self.client.get(first['comments_next']).json()
+        self.assertEqual(len(second['comments']), 1)
+        self.assertIsNone(second['comments_next'])
+
+    def test_follow_feed_requires_login(self):
+        url = reverse('api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        data = self.authorized_client.get(url).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    def test_unchanged_feed_answers_304_without_queries(self):
+        url = reverse('api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+        since = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        Post.objects.create(text='Новая история', author=self.author)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_comment_changes_post_etag(self):
+        url = reverse('api_post', kwargs={'username': 'panda',
+                                          'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(text='Отлично', author=self.reader,
+                               post=self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['comments']), 1)
+
+    def test_html_pages_support_conditional_get(self):
+        url = reverse('profile', kwargs={'username': 'panda'})
+        etag = self.authorized_client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+        with run_on_commit():
+            Follow.objects.filter(user=self.reader).delete()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['following'])
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..benchmark import VIEWS, compare, percentile
+from ..counters import repair_counters
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class DataGeneratorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('generate_data', users=50, groups=3, follows=400,
+                     posts=300, comments=100, batch_size=64,
+                     stdout=StringIO())
+
+    def test_rows_are_created(self):
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertEqual(
+            Post.objects.values('pub_date').distinct().count(), 300)
+
+    def test_follower_distribution_is_skewed(self):
+        counts = list(UserStats.objects.order_by('-follower_count')
+                      .values_list('follower_count', flat=True))
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+    def test_derived_data_is_consistent(self):
+        self.assertEqual(set(repair_counters().values()), {0})
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user,
+                                         author=follow.author).count(),
+            Post.objects.filter(author=follow.author).count())
+        self.assertTrue(search_posts('панда', limit=1))
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('generate_data', users=10, groups=2, follows=30,
+                     posts=40, comments=10, stdout=StringIO())
+
+    def setUp(self):
+        handle, self.output = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.output)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_report_is_saved(self):
+        call_command('benchmark', requests=3, output=self.output,
+                     stdout=StringIO())
+        with open(self.output, encoding='utf-8') as source:
+            report = json.load(source)
+        self.assertEqual(set(report['results']), set(VIEWS))
+        for view, result in report['results'].items():
+            with self.subTest(value=view):
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['peak_memory_kb'], 0)
+        self.assertEqual(report['dataset']['posts'], Post.objects.count())
+
+    def test_regression_against_baseline_fails(self):
+        baseline = {'results': {'index': {'p95_ms': 0.001}}}
+        with open(self.output, 'w', encoding='utf-8') as output:
+            json.dump(baseline, output)
+        with self.assertRaises(CommandError):
+            call_command('benchmark', requests=2, views=['index'],
+                         output=os.devnull, compare=self.output,
+                         stdout=StringIO())
+
+    def test_compare_marks_regressions(self):
+        baseline = {'results': {'index': {'p95_ms': 10.0},
+                                'profile': {'p95_ms': 10.0}}}
+        report = {'results': {'index': {'p95_ms': 15.0},
+                              'profile': {'p95_ms': 11.0},
+                              'post_view': {'p95_ms': 1.0}}}
+        self.assertEqual(compare(baseline, report),
+                         [('index', 10.0, 15.0, 50.0, True),
+                          ('profile', 10.0, 11.0, 10.0, False)])
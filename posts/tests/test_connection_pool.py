@@ -0,0 +1,112 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from yatube.db import pool
+
+from ..benchmark import sqlite_throughput
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.connections = ConnectionHandler({
+            'default': {
+                'ENGINE': 'yatube.db.backends.sqlite3',
+                'NAME': self.path,
+                'POOL': {'SIZE': 2, 'MIN': 2, 'HEALTH_CHECK_AFTER': 0},
+            },
+        })
+        self.wrapper = self.connections['default']
+
+    def tearDown(self):
+        self.wrapper.close()
+        pool.close_pools()
+        os.remove(self.path)
+
+    def raw_connection(self):
+        self.wrapper.ensure_connection()
+        return self.wrapper.connection
+
+    def test_closed_connection_returns_to_pool(self):
+        first = self.raw_connection()
+        self.wrapper.close()
+        self.assertIsNone(self.wrapper.connection)
+        self.assertEqual(len(self.wrapper.get_pool()), 1)
+        self.assertIs(self.raw_connection(), first)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_unhealthy_connection_is_replaced(self):
+        first = self.raw_connection()
+        self.wrapper.close()
+        first.close()
+        self.assertIsNot(self.raw_connection(), first)
+        self.assertEqual(len(self.wrapper.get_pool()), 0)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE note (text TEXT)')
+        self.wrapper.set_autocommit(False)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("INSERT INTO note VALUES ('draft')")
+        self.wrapper.close()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM note')
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_warm_up_opens_minimum_connections(self):
+        with mock.patch.object(pool, 'connections', self.connections):
+            pool.warm_up()
+        self.assertEqual(len(self.wrapper.get_pool()), 2)
+
+    def test_forked_worker_gets_own_pool(self):
+        parent_pool = self.wrapper.get_pool()
+        with mock.patch.object(pool.os, 'getpid', return_value=-1):
+            self.assertIsNot(self.wrapper.get_pool(), parent_pool)
+
+
+class TunedSQLiteTests(SimpleTestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def wrapper(self, **settings):
+        return ConnectionHandler({
+            'default': {'ENGINE': 'yatube.db.backends.sqlite3',
+                        'NAME': self.path, **settings},
+        })['default']
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        wrapper = self.wrapper(PRAGMAS={'cache_size': -2048,
+                                        'mmap_size': None})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -2048)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 0)
+        wrapper.close()
+
+    def test_concurrent_writers_are_not_locked_out(self):
+        result = sqlite_throughput('yatube.db.backends.sqlite3',
+                                   writers=4, readers=2, duration=0.5)
+        self.assertEqual(result['write_errors'], 0)
+        self.assertEqual(result['read_errors'], 0)
+        self.assertGreater(result['writes_per_second'], 0)
@@ -0,0 +1,161 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.db.models.signals import pre_save
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        cls.reader = User.objects.create_user(username='wolf')
+        cls.group = Group.objects.create(title='pandas group',
+                                         slug='pandas',
+                                         description='Pandas stories')
+        cls.group_other = Group.objects.create(title='bear group',
+                                               slug='bear',
+                                               description='Bear stories')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, expected_value in expected.items():
+            with self.subTest(value=field):
+                self.assertEqual(getattr(stats, field), expected_value)
+
+    def test_post_counters(self):
+        post = Post.objects.create(text='История', author=self.user,
+                                   group=self.group)
+        self.assertStats(self.user, post_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 1)
+
+        post.group = self.group_other
+        post.save()
+        self.group.refresh_from_db()
+        self.group_other.refresh_from_db()
+        self.assertEqual(self.group.post_count, 0)
+        self.assertEqual(self.group_other.post_count, 1)
+
+        post.delete()
+        self.group_other.refresh_from_db()
+        self.assertStats(self.user, post_count=0)
+        self.assertEqual(self.group_other.post_count, 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text='История', author=self.user)
+        comment = Comment.objects.create(text='Коментарий',
+                                         author=self.reader, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def delete_queries(self, comments, delete):
+        post = Post.objects.create(text='История', author=self.user,
+                                   group=self.group)
+        Comment.objects.bulk_create(
+            [Comment(text='Ура', author=self.reader, post=post)
+             for _ in range(comments)])
+        with CaptureQueriesContext(connection) as queries:
+            deleted, rows = delete(post)
+        self.assertEqual(rows['posts.Comment'], comments)
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+        return len(queries)
+
+    def test_post_delete_does_not_touch_each_comment(self):
+        deletes = {
+            'instance': lambda post: post.delete(),
+            'queryset': lambda post: Post.objects.filter(pk=post.pk).delete(),
+        }
+        for name, delete in deletes.items():
+            with self.subTest(value=name):
+                self.assertEqual(self.delete_queries(200, delete),
+                                 self.delete_queries(2, delete))
+
+    def test_follow_counters(self):
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertStats(self.user, follower_count=1, following_count=0)
+        self.assertStats(self.reader, follower_count=0, following_count=1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertStats(self.user, follower_count=0)
+        self.assertStats(self.reader, following_count=0)
+
+    def test_repair_counters_command(self):
+        post = Post.objects.create(text='История', author=self.user,
+                                   group=self.group)
+        Comment.objects.create(text='Коментарий', author=self.reader,
+                               post=post)
+        Follow.objects.create(user=self.reader, author=self.user)
+        Post.objects.update(comment_count=7)
+        Group.objects.update(post_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        UserStats.objects.filter(user=self.user).update(follower_count=7)
+
+        out = StringIO()
+        call_command('repair_counters', batch_size=1, stdout=out)
+
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.group.post_count, 1)
+        self.assertStats(self.user, follower_count=1, post_count=1)
+        self.assertStats(self.reader, following_count=1)
+        self.assertIn('Post.comment_count: исправлено 1', out.getvalue())
+
+
+class ConcurrentSaveTests(TestCase):
+    """Правка публикации или группы не затирает счётчики, сдвинутые
+    между чтением объекта и его сохранением."""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret')
+        self.group = Group.objects.create(title='Бамбук', slug='bamboo',
+                                          description='Про бамбук')
+        self.post = Post.objects.create(text='История', author=self.user,
+                                        group=self.group)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def meanwhile(self, model, **changes):
+        """Сдвигает поля строки прямо перед сохранением объекта."""
+        def receiver(sender, instance, **kwargs):
+            model.objects.filter(pk=instance.pk).update(
+                **{field: F(field) + delta
+                   for field, delta in changes.items()})
+        pre_save.connect(receiver, sender=model, weak=False)
+        self.addCleanup(pre_save.disconnect, receiver, sender=model)
+
+    def test_post_edit_keeps_comment_count_and_score(self):
+        self.meanwhile(Post, comment_count=5, trending_score=1)
+        self.client.post(
+            reverse('post_edit', kwargs={'username': self.user.username,
+                                         'post_id': self.post.pk}),
+            {'text': 'Исправленная история', 'group': self.group.pk})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Исправленная история')
+        self.assertEqual(self.post.comment_count, 5)
+        self.assertEqual(self.post.trending_score, 3)
+
+    def test_group_admin_keeps_post_count(self):
+        self.meanwhile(Group, post_count=5, trending_score=1)
+        self.client.post(
+            reverse('admin:posts_group_change', args=[self.group.pk]),
+            {'title': 'Бамбук и панды', 'slug': 'bamboo',
+             'description': 'Про бамбук'})
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.title, 'Бамбук и панды')
+        self.assertEqual(self.group.post_count, 6)
+        self.assertEqual(self.group.trending_score, 3)
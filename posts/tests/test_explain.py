@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..explain import feed_queries, problems
+from ..models import Comment, Follow, Group, Post
+from ..timeline import get_timeline_store
+
+User = get_user_model()
+
+
+class ExplainFeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Бамбук', slug='bamboo')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        posts = [Post.objects.create(text=f'Панда номер {number}',
+                                     author=cls.author, group=cls.group)
+                 for number in range(3)]
+        Comment.objects.create(text='Отлично', author=cls.reader,
+                               post=posts[0])
+
+    def test_all_feed_queries_are_collected(self):
+        names = [name for name, _ in feed_queries()]
+        self.assertEqual(names, ['index', 'index_after', 'group_posts',
+                                 'group_list', 'group_list_after',
+                                 'profile', 'followers', 'follow_index',
+                                 'following', 'comments', 'search',
+                                 'search_all_terms'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'план в формате SQLite')
+    def test_feeds_use_composite_indexes(self):
+        plans = {name: queryset.explain()
+                 for name, queryset in feed_queries()}
+        expected = {'index': 'post_pub_date_idx',
+                    'group_posts': 'post_group_pub_date_idx',
+                    'group_list': 'group_activity_idx',
+                    'group_list_after': 'group_activity_idx',
+                    'profile': 'post_author_pub_date_idx',
+                    'followers': 'COVERING INDEX follow_author_user_idx',
+                    'follow_index': 'timeline_user_pub_date_idx',
+                    'comments': 'comment_post_created_idx',
+                    'search': 'search_token_impact_idx',
+                    'search_all_terms': 'search_token_impact_idx'}
+        for name, index in expected.items():
+            with self.subTest(name=name):
+                self.assertIn(index, plans[name])
+                self.assertEqual(problems(plans[name]), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'план в формате SQLite')
+    @override_settings(POSTS_TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_pulled_authors_are_read_by_index_range(self):
+        get_timeline_store().sync([self.author.pk])
+        plans = dict((name, queryset.explain())
+                     for name, queryset in feed_queries())
+        self.assertIn('post_author_pub_date_idx',
+                      plans['follow_index_pulled'])
+        self.assertEqual(problems(plans['follow_index_pulled']), [])
+
+    def test_problems_detects_scans_and_sorts(self):
+        self.assertEqual(problems('2 0 0 SCAN posts_post', 'sqlite'),
+                         ['2 0 0 SCAN posts_post'])
+        self.assertEqual(
+            problems('2 0 0 SCAN posts_post USING INDEX post_pub_date_idx',
+                     'sqlite'), [])
+        self.assertEqual(
+            problems('Sort\n  ->  Seq Scan on posts_post', 'postgresql'),
+            ['Sort', '->  Seq Scan on posts_post'])
+
+    def test_command_prints_plan_for_each_query(self):
+        output = StringIO()
+        call_command('explain_feeds', '--only', 'index', 'profile',
+                     stdout=output)
+        self.assertIn('== index', output.getvalue())
+        self.assertIn('== profile', output.getvalue())
+        self.assertNotIn('== group_posts', output.getvalue())
+        self.assertIn('Запросов: 2', output.getvalue())
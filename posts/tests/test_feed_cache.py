@@ -0,0 +1,215 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from .. import feed_cache
+from ..models import Comment, Follow, Group, Post
+from .on_commit import run_on_commit
+
+User = get_user_model()
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        cls.reader = User.objects.create_user(username='wolf')
+        cls.group = Group.objects.create(title='pandas group',
+                                         slug='pandas',
+                                         description='Pandas stories')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.post = Post.objects.create(text='Первая история',
+                                       author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.feed_urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('follow_index'),
+        )
+
+    def page_of(self, url):
+        return tuple(
+            self.authorized_client.get(url).context['page'].object_list)
+
+    def test_feed_pages_are_served_from_cache(self):
+        for url in self.feed_urls:
+            self.page_of(url)
+        Post.objects.filter(pk=self.post.pk).update(text='dummy')
+        hits = feed_cache.stats['hits']
+        for url in self.feed_urls:
+            with self.subTest(value=url):
+                self.assertEqual(self.page_of(url)[0].text, self.post.text)
+        self.assertEqual(feed_cache.stats['hits'], hits + len(self.feed_urls))
+
+    def test_new_post_invalidates_affected_feeds(self):
+        for url in self.feed_urls:
+            self.page_of(url)
+        post = Post.objects.create(text='Вторая история',
+                                   author=self.user,
+                                   group=self.group)
+        # Лента подписок сбрасывается после коммита, которого внутри
+        # TestCase нет, см. FollowFeedInvalidationTests.
+        for url in self.feed_urls[:-1]:
+            with self.subTest(value=url):
+                self.assertEqual(self.page_of(url), (post, self.post))
+
+    def test_comment_refreshes_cached_counter(self):
+        self.page_of(reverse('index'))
+        Comment.objects.create(text='Коментарий',
+                               author=self.reader,
+                               post=self.post)
+        page = self.page_of(reverse('index'))
+        self.assertEqual(page[0].comment_count, 1)
+
+    def test_unfollow_invalidates_follow_feed(self):
+        self.page_of(reverse('follow_index'))
+        with run_on_commit():
+            Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.page_of(reverse('follow_index')), ())
+
+    @override_settings(POSTS_FEED_LOCK_TIMEOUT=0.1)
+    def test_page_is_served_while_another_worker_holds_the_lock(self):
+        add = cache.add
+
+        def add_unless_lock(key, *args, **kwargs):
+            if key.endswith(':lock'):
+                return False
+            return add(key, *args, **kwargs)
+
+        busy = feed_cache.stats['busy']
+        with mock.patch.object(feed_cache.cache, 'add', add_unless_lock):
+            response = self.authorized_client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(tuple(response.context['page']), (self.post,))
+        self.assertEqual(feed_cache.stats['busy'], busy + 1)
+
+    def test_group_change_moves_post_between_group_feeds(self):
+        group_other = Group.objects.create(title='bear group',
+                                           slug='bear',
+                                           description='Bear stories')
+        old_url = reverse('group_posts', kwargs={'slug': self.group.slug})
+        new_url = reverse('group_posts', kwargs={'slug': group_other.slug})
+        self.page_of(old_url)
+        self.page_of(new_url)
+        self.post.group = group_other
+        self.post.save()
+        self.assertEqual(self.page_of(old_url), ())
+        self.assertEqual(self.page_of(new_url), (self.post,))
+
+
+@override_settings(POSTS_FEED_BUMP_WORKERS=0)
+class FollowFeedInvalidationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='panda')
+        self.readers = [User.objects.create_user(username=f'fan{number}')
+                        for number in range(3)]
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+
+    def versions(self):
+        return feed_cache.get_versions(
+            [feed_cache.follow_scope(reader.pk) for reader in self.readers])
+
+    def test_new_post_bumps_followers_after_commit(self):
+        before = self.versions()
+        with transaction.atomic():
+            Post.objects.create(text='История', author=self.author)
+            self.assertEqual(self.versions(), before)
+        after = self.versions()
+        self.assertTrue(all(new != old for new, old in zip(after, before)))
+
+    def test_follow_page_shows_new_post(self):
+        client = Client()
+        client.force_login(self.readers[-1])
+        url = reverse('follow_index')
+        self.assertEqual(len(client.get(url).context['page']), 0)
+        with mock.patch.object(feed_cache, 'FOLLOWER_BATCH_SIZE', 2):
+            post = Post.objects.create(text='История', author=self.author)
+        self.assertEqual(list(client.get(url).context['page']), [post])
+
+
+class StampedeTests(SimpleTestCase):
+    workers = 20
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return f'value {self.calls}'
+
+    def run_concurrently(self, key, stale_key):
+        results = []
+        barrier = threading.Barrier(self.workers)
+
+        def worker():
+            barrier.wait()
+            results.append(feed_cache.get_or_compute(
+                key, stale_key, self.compute, 60))
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_is_computed_once(self):
+        results = self.run_concurrently('key:cold', 'stale:cold')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['value 1'] * self.workers)
+
+    def test_one_origin_call_per_expiry(self):
+        for expiry in range(1, 4):
+            with self.subTest(value=expiry):
+                cache.delete('key:expiring')
+                results = self.run_concurrently('key:expiring',
+                                                'stale:expiring')
+                self.assertEqual(self.calls, expiry)
+                self.assertEqual(len(results), self.workers)
+
+    def test_stale_value_is_served_while_locked(self):
+        cache.set('stale:locked', 'stale value')
+        cache.add('key:locked:lock', 1)
+        value = feed_cache.get_or_compute('key:locked', 'stale:locked',
+                                          self.compute, 60)
+        self.assertEqual(value, 'stale value')
+        self.assertEqual(self.calls, 0)
+
+    def test_busy_lock_is_not_taken_over_after_wait(self):
+        cache.add('key:busy:lock', 1, 60)
+        with self.settings(POSTS_FEED_LOCK_TIMEOUT=0.1):
+            value = feed_cache.get_or_compute('key:busy', 'stale:busy',
+                                              self.compute, 60)
+        self.assertEqual(value, 'value 1')
+        self.assertIsNone(cache.get('key:busy'))
+        self.assertEqual(cache.get('key:busy:lock'), 1)
+
+    def test_early_recomputation_near_expiry(self):
+        cache.set('key:early', ('old value', 1.0, time.time() + 0.5), 60)
+        with mock.patch.object(feed_cache.random, 'random',
+                               return_value=0.1):
+            value = feed_cache.get_or_compute('key:early', 'stale:early',
+                                              self.compute, 60)
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(cache.get('key:early')[0], 'value 1')
@@ -0,0 +1,207 @@
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import feed_cache
+from ..follows import follow, follow_edges, unfollow, unfollow_edges
+from ..models import Follow, Post, TimelineEntry, UserStats
+from .query_budget import query_budget
+
+User = get_user_model()
+
+
+class FollowEdgesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [User.objects.create_user(username=f'user{number}')
+                     for number in range(4)]
+        cls.post = Post.objects.create(text='История',
+                                       author=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_edges_skips_duplicates_and_self(self):
+        first, second, third, _ = (user.pk for user in self.users)
+        Follow.objects.create(user_id=first, author_id=third)
+        created = follow_edges([(first, second), (first, second),
+                                (first, third), (second, second),
+                                (third, second)])
+        self.assertEqual(created, 2)
+        self.assertEqual(Follow.objects.count(), 3)
+        self.assertEqual(self.stats(self.users[1]).follower_count, 2)
+        self.assertEqual(self.stats(self.users[0]).following_count, 2)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            {(first, self.post.pk), (third, self.post.pk)})
+        self.assertEqual(follow_edges([(first, second)]), 0)
+
+    def test_unfollow_edges(self):
+        first, second, third, _ = (user.pk for user in self.users)
+        follow_edges([(first, second), (first, third)])
+        self.assertEqual(unfollow_edges([(first, second), (third, first)]),
+                         1)
+        self.assertEqual(list(Follow.objects.values_list('author_id',
+                                                         flat=True)),
+                         [third])
+        self.assertEqual(self.stats(self.users[1]).follower_count, 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_import_command(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as output:
+            output.write('follower,author\n'
+                         'user0,user1\nuser2,user1\nuser0,user1\n'
+                         'user3,ghost\n')
+        self.addCleanup(os.remove, path)
+        stdout = StringIO()
+        call_command('import_follows', path, '--skip-header',
+                     '--batch-size', '2', stdout=stdout)
+        self.assertIn('Обработано пар: 4, новых подписок: 2, '
+                      'неизвестных пользователей: 1', stdout.getvalue())
+        self.assertEqual(self.stats(self.users[1]).follower_count, 2)
+
+    def test_import_command_skips_unknown_ids(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        missing = max(user.pk for user in self.users) + 1
+        with os.fdopen(handle, 'w', encoding='utf-8') as output:
+            output.write(f'{self.users[0].pk},{self.users[1].pk}\n'
+                         f'{missing},{self.users[1].pk}\n'
+                         f'{self.users[2].pk},{missing}\n')
+        self.addCleanup(os.remove, path)
+        stdout = StringIO()
+        call_command('import_follows', path, '--ids', stdout=stdout)
+        self.assertIn('Обработано пар: 3, новых подписок: 1, '
+                      'неизвестных пользователей: 1', stdout.getvalue())
+        self.assertEqual(self.stats(self.users[1]).follower_count, 1)
+
+
+class ConcurrentFollowTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(text='История', author=self.author)
+
+    def run_threads(self, action):
+        barrier = threading.Barrier(self.THREADS)
+        results, errors = [], []
+
+        def worker():
+            try:
+                barrier.wait()
+                results.append(action(self.reader.pk, self.author.pk))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def assert_state(self, following):
+        self.assertEqual(Follow.objects.count(), int(following))
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.follower_count, int(following))
+        stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(stats.following_count, int(following))
+        self.assertEqual(TimelineEntry.objects.exists(), following)
+
+    def test_parallel_follow_creates_one_subscription(self):
+        self.assertEqual(self.run_threads(follow).count(True), 1)
+        self.assert_state(following=True)
+        self.assertFalse(follow(self.reader.pk, self.author.pk))
+
+    def test_parallel_unfollow_removes_it_once(self):
+        follow(self.reader.pk, self.author.pk)
+        self.assertEqual(self.run_threads(unfollow).count(True), 1)
+        self.assert_state(following=False)
+        self.assertFalse(unfollow(self.reader.pk, self.author.pk))
+
+    def test_mixed_follow_and_unfollow_keep_counters_consistent(self):
+        def toggle(user_id, author_id):
+            for _ in range(5):
+                follow(user_id, author_id)
+                unfollow(user_id, author_id)
+            return follow(user_id, author_id)
+
+        self.run_threads(toggle)
+        self.assert_state(following=True)
+
+    def test_feeds_are_invalidated_after_commit(self):
+        follow(self.reader.pk, self.author.pk)
+        scopes = [feed_cache.follow_scope(self.reader.pk),
+                  feed_cache.profile_scope(self.author.pk)]
+        before = feed_cache.get_versions(scopes)
+        with transaction.atomic():
+            unfollow_edges([(self.reader.pk, self.author.pk)])
+            self.assertEqual(feed_cache.get_versions(scopes), before)
+        after = feed_cache.get_versions(scopes)
+        self.assertTrue(all(new != old for new, old in zip(after, before)))
+
+
+@query_budget
+class BulkFollowApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('api_bulk_follow')
+
+    def post(self, data, client=None):
+        return (client or self.client).post(
+            self.url, json.dumps(data), content_type='application/json')
+
+    def test_follow_and_unfollow_by_username(self):
+        data = self.post({'follow': ['author0', 'author1', 'author2',
+                                     'nobody']}).json()
+        self.assertEqual(data, {'followed': 3, 'unfollowed': 0,
+                                'unknown': ['nobody']})
+        data = self.post({'follow': ['author3'],
+                          'unfollow': ['author0']}).json()
+        self.assertEqual(data, {'followed': 1, 'unfollowed': 1,
+                                'unknown': []})
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.reader)
+                .values_list('author__username', flat=True)),
+            {'author1', 'author2', 'author3'})
+
+    def test_rejects_anonymous_and_bad_requests(self):
+        self.assertEqual(self.post({'follow': ['author0']},
+                                   client=Client()).status_code, 401)
+        self.assertEqual(self.post(['author0']).status_code, 400)
+        self.assertEqual(self.post({'follow': [{}]}).status_code, 400)
+        self.assertEqual(self.post({'follow': 'author0'}).status_code, 400)
+        with override_settings(POSTS_BULK_FOLLOW_LIMIT=2):
+            response = self.post({'follow': ['author0', 'author1',
+                                             'author2']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
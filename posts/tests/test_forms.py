@@ -1,16 +1,25 @@
+import os
 import shutil
 import tempfile
+import zlib
+from io import BytesIO
+from unittest import mock
 
 from django.core.exceptions import ValidationError
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, ImageFile
 
+from ..forms import PostForm
+from ..imaging import read_image_header
 from ..models import Post, Group
 
 
+@override_settings(POSTS_THUMBNAIL_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -152,3 +161,75 @@ class PostCreateFormTests(TestCase):
                                           follow=True)
 
         self.assertRedirects(response, redirect_url)
+
+
+def png_claiming(width, height):
+    """PNG 1x1, в заголовке которого записаны другие размеры."""
+    content = BytesIO()
+    Image.new('RGB', (1, 1)).save(content, 'PNG')
+    data = bytearray(content.getvalue())
+    data[16:24] = width.to_bytes(4, 'big') + height.to_bytes(4, 'big')
+    data[29:33] = zlib.crc32(bytes(data[12:29])).to_bytes(4, 'big')
+    return bytes(data)
+
+
+def jpeg_with_exif(exif_size, size=(8, 8), noise=False):
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size, color=(0, 128, 255))
+    content = BytesIO()
+    exif = b'Exif\x00\x00' + b'\x00' * (exif_size - 6)
+    image.save(content, 'JPEG', quality=95, exif=exif)
+    return content.getvalue()
+
+
+class PostFormImageTests(TestCase):
+    def clean(self, upload):
+        form = PostForm(data={'text': 'С картинкой'},
+                        files={'image': upload})
+        form.is_valid()
+        return form
+
+    def test_image_with_too_many_pixels_is_rejected(self):
+        upload = SimpleUploadedFile('huge.png', png_claiming(6000, 6000),
+                                    content_type='image/png')
+        form = self.clean(upload)
+        self.assertEqual(form.errors['image'],
+                         ['Слишком большое разрешение: 6000x6000'])
+
+    @override_settings(POSTS_IMAGE_MAX_BYTES=1024)
+    def test_image_over_byte_limit_is_rejected(self):
+        upload = SimpleUploadedFile('big.jpg', jpeg_with_exif(2048),
+                                    content_type='image/jpeg')
+        form = self.clean(upload)
+        self.assertEqual(form.errors['image'],
+                         ['Файл слишком большой, максимум 1,0\xa0КБ'])
+
+    @override_settings(POSTS_IMAGE_MAX_EXIF_BYTES=1024)
+    def test_oversized_exif_is_stripped(self):
+        upload = SimpleUploadedFile('exif.jpg', jpeg_with_exif(4096),
+                                    content_type='image/jpeg')
+        form = self.clean(upload)
+        image = form.cleaned_data['image']
+        size, exif_size = read_image_header(image)
+        self.assertEqual(size, (8, 8))
+        self.assertEqual(exif_size, 0)
+        self.assertLess(image.size, 4096)
+
+    @override_settings(POSTS_IMAGE_MAX_BYTES=64 * 1024 * 1024,
+                       POSTS_IMAGE_MAX_EXIF_BYTES=1024)
+    def test_large_upload_is_validated_without_loading_it(self):
+        upload = TemporaryUploadedFile('large.jpg', 'image/jpeg', 0, None)
+        upload.write(jpeg_with_exif(32 * 1024, size=(2000, 2000), noise=True))
+        upload.size = upload.tell()
+        upload.seek(0)
+        # Буферы декодера Pillow выделяются в C и не видны tracemalloc,
+        # поэтому проверяется, что пиксели вообще не декодируются.
+        with mock.patch.object(ImageFile.ImageFile, 'load') as load, \
+                mock.patch.object(Image.Image, 'load') as base_load:
+            form = self.clean(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        load.assert_not_called()
+        base_load.assert_not_called()
+        self.assertEqual(read_image_header(form.cleaned_data['image'])[1], 0)
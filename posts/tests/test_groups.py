@@ -0,0 +1,130 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..groups import directory, refresh, touch
+from ..models import Comment, Group, GroupPoster, Post
+from ..paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class GroupStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.first = User.objects.create_user(username='First')
+        self.second = User.objects.create_user(username='Second')
+        self.group = Group.objects.create(title='Бамбук', slug='bamboo')
+        self.quiet = Group.objects.create(title='Тишина', slug='quiet')
+        self.posts = [
+            Post.objects.create(text='История', author=author,
+                                group=self.group)
+            for author in (self.first, self.second, self.second)
+        ]
+        self.client = Client()
+
+    def test_posts_and_comments_update_group(self):
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 3)
+        self.assertEqual(self.group.last_activity, self.posts[-1].pub_date)
+        comment = Comment.objects.create(text='Ура', author=self.first,
+                                         post=self.posts[0])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.last_activity, comment.created)
+        self.quiet.refresh_from_db()
+        self.assertEqual(self.quiet.post_count, 0)
+        self.assertIsNone(self.quiet.last_activity)
+
+    def test_old_activity_does_not_move_back(self):
+        self.group.refresh_from_db()
+        latest = self.group.last_activity
+        touch(self.group.pk, latest - timedelta(days=1))
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.last_activity, latest)
+
+    def test_refresh_ranks_top_posters(self):
+        self.assertEqual(refresh(limit=1), 1)
+        self.assertEqual(
+            list(GroupPoster.objects.values_list('group', 'author', 'rank',
+                                                 'post_count')),
+            [(self.group.pk, self.second.pk, 1, 2)])
+
+    def test_deleting_latest_activity_moves_it_back(self):
+        comment = Comment.objects.create(text='Ура', author=self.first,
+                                         post=self.posts[0])
+        comment.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.last_activity, self.posts[-1].pub_date)
+        Comment.objects.create(text='Ещё', author=self.first,
+                               post=self.posts[-1])
+        self.posts[-1].delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.last_activity, self.posts[-2].pub_date)
+
+    def test_moving_post_recounts_both_groups(self):
+        comment = Comment.objects.create(text='Ура', author=self.first,
+                                         post=self.posts[-1])
+        self.posts[-1].group = self.quiet
+        self.posts[-1].save()
+        self.group.refresh_from_db()
+        self.quiet.refresh_from_db()
+        self.assertEqual(self.group.last_activity, self.posts[-2].pub_date)
+        self.assertEqual(self.quiet.last_activity, comment.created)
+
+    def test_activity_command_repairs_all_groups(self):
+        Group.objects.update(last_activity=timezone.now())
+        call_command('refresh_group_stats', '--activity', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.quiet.refresh_from_db()
+        self.assertEqual(self.group.last_activity, self.posts[-1].pub_date)
+        self.assertIsNone(self.quiet.last_activity)
+
+    def test_directory_page(self):
+        refresh()
+        response = self.client.get(reverse('group_list'))
+        page = response.context['page']
+        self.assertEqual(list(page)[0], self.group)
+        self.assertEqual(
+            [poster.author for poster in page[0].top_posters.all()],
+            [self.second, self.first])
+        self.assertContains(response, '@Second')
+
+    def test_directory_query_count_does_not_grow(self):
+        refresh()
+        for number in range(5):
+            group = Group.objects.create(title=f'Группа {number}',
+                                         slug=f'group-{number}')
+            Post.objects.create(text='История', author=self.first,
+                                group=group)
+        refresh()
+        with self.assertNumQueries(2):
+            self.client.get(reverse('group_list'))
+
+    def test_directory_pages_through_groups_without_activity(self):
+        for number in range(3):
+            Group.objects.create(title=f'Группа {number}',
+                                 slug=f'group-{number}')
+        expected = list(Group.objects.order_by('-last_activity', '-pk'))
+        paginator = CursorPaginator(directory(), 2, field='last_activity')
+        pages = [paginator.get_page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(after=pages[-1].next_cursor))
+        self.assertEqual([group for page in pages for group in page],
+                         expected)
+        back = paginator.get_page(before=pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    def test_group_page_shows_top_posters(self):
+        call_command('refresh_group_stats', stdout=StringIO())
+        response = self.client.get(
+            reverse('group_posts', kwargs={'slug': self.group.slug}))
+        self.assertEqual([poster.author
+                          for poster in response.context['top_posters']],
+                         [self.second, self.first])
+        self.assertContains(response, 'Публикаций: 3')
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(POSTS_INSTRUMENTATION_SAMPLE_RATE=1.0)
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        Post.objects.create(text='Первая история', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_header(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('index'))
+        timings = self.timings(response)
+        self.assertEqual(set(timings),
+                         {'total', 'db', 'tpl', 'cache', 'thumb'})
+        self.assertEqual(timings['db']['desc'], '"1 queries"')
+        self.assertGreater(float(timings['tpl']['dur']), 0)
+        self.assertEqual(timings['cache']['desc'], '"0 hits / 1 misses"')
+
+        response = self.client.get(reverse('index'))
+        self.assertEqual(self.timings(response)['cache']['desc'],
+                         '"1 hits / 0 misses"')
+
+    def test_structured_log_line(self):
+        with self.assertLogs('posts.instrumentation', 'INFO') as logs:
+            self.client.get(reverse('index'))
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.metrics['view'], 'index')
+        self.assertEqual(record.metrics['status'], 200)
+        self.assertIn('queries=1', record.getMessage())
+
+    @override_settings(POSTS_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..paginators import COMMENTS_PAGE_SIZE, CursorPaginator, decode_cursor
+from .query_budget import query_budget
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        for i in range(25):
+            Post.objects.create(text=f'Про панду история {i}',
+                                author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_pages_walk_whole_feed(self):
+        paginator = CursorPaginator(Post.objects.all())
+        page = paginator.get_page()
+        collected = list(page.object_list)
+        while page.next_cursor:
+            page = paginator.get_page(after=page.next_cursor)
+            collected.extend(page.object_list)
+        expected_value = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(collected, expected_value)
+
+    def test_before_returns_previous_page(self):
+        paginator = CursorPaginator(Post.objects.all())
+        first_page = paginator.get_page()
+        second_page = paginator.get_page(after=first_page.next_cursor)
+        previous_page = paginator.get_page(before=second_page.previous_cursor)
+        self.assertEqual(list(previous_page.object_list),
+                         list(first_page.object_list))
+        self.assertIsNone(paginator.get_page().previous_cursor)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.client.get(reverse('index') + '?after=broken')
+        expected_value = tuple(Post.objects.all()[:10])
+        actual_value = tuple(response.context.get('page').object_list)
+        self.assertEqual(actual_value, expected_value)
+
+    def test_cursor_page_does_not_count(self):
+        paginator = CursorPaginator(Post.objects.all())
+        first_page = paginator.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            paginator.get_page(after=first_page.next_cursor)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+        self.assertNotIn('OFFSET', queries[0]['sql'].upper())
+
+
+@query_budget
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        cls.post = Post.objects.create(text='Про бамбук', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {i}', author=cls.user, post=cls.post)
+            for i in range(COMMENTS_PAGE_SIZE * 2 + 5))
+        Post.objects.filter(pk=cls.post.pk).update(
+            comment_count=COMMENTS_PAGE_SIZE * 2 + 5)
+        cls.post_url = reverse('post', kwargs={'username': 'panda',
+                                               'post_id': cls.post.pk})
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_post_shows_first_page_and_link_to_next(self):
+        response = self.client.get(self.post_url)
+        expected_value = list(self.post.comments.order_by('created', 'pk')
+                              [:COMMENTS_PAGE_SIZE])
+        self.assertEqual(list(response.context['comments']), expected_value)
+        self.assertIn(reverse('post_comments',
+                              kwargs={'username': 'panda',
+                                      'post_id': self.post.pk}),
+                      response.context['next_comments'])
+
+    def test_fragments_walk_remaining_comments(self):
+        next_url = self.client.get(self.post_url).context['next_comments']
+        pages = 0
+        html = ''
+        while next_url:
+            data = self.client.get(next_url).json()
+            html += data['html']
+            next_url = data['next']
+            pages += 1
+        self.assertEqual(pages, 2)
+        remaining = self.post.comments.order_by(
+            'created', 'pk')[COMMENTS_PAGE_SIZE:]
+        self.assertEqual(html.count('name="comment_'), len(remaining))
+        for comment in remaining:
+            self.assertIn(f'name="comment_{comment.pk}"', html)
+
+    def test_fragment_of_foreign_post_is_not_found(self):
+        other = User.objects.create_user(username='fox')
+        url = reverse('post_comments', kwargs={'username': other.username,
+                                               'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
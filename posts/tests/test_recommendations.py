@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..follows import follow
+from ..models import Follow, Group, Post, Recommendation
+from ..recommendations import build, suggestions
+
+User = get_user_model()
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in 'abcdef'}
+        for user, author in ('ab', 'bc', 'bd', 'ae', 'ec', 'ca'):
+            Follow.objects.create(user=cls.users[user],
+                                  author=cls.users[author])
+        group = Group.objects.create(title='Бамбук', slug='bamboo')
+        for name in 'af':
+            Post.objects.create(text='История', author=cls.users[name],
+                                group=group)
+
+    def setUp(self):
+        cache.clear()
+
+    def build(self, **kwargs):
+        return sum(saved for _, saved in build(**kwargs))
+
+    def ranked(self, name):
+        return [(item.candidate.username, item.mutual_count,
+                 item.shared_groups)
+                for item in Recommendation.objects.filter(
+                    user=self.users[name]).order_by('rank')]
+
+    def test_friends_of_friends_and_group_neighbours(self):
+        self.build()
+        self.assertEqual(self.ranked('a'),
+                         [('c', 2, 0), ('d', 1, 0), ('f', 0, 1)])
+        self.assertEqual(self.ranked('f'), [('a', 0, 1)])
+
+    def test_chunks_and_rebuilds_give_same_result(self):
+        self.build()
+        expected = {name: self.ranked(name) for name in self.users}
+        self.build(chunk_size=1)
+        self.assertEqual({name: self.ranked(name) for name in self.users},
+                         expected)
+
+    def test_top_k_limit(self):
+        self.build(limit=1)
+        self.assertEqual(self.ranked('a'), [('c', 2, 0)])
+
+    def test_followed_candidates_are_hidden(self):
+        self.build()
+        follow(self.users['a'].pk, self.users['c'].pk)
+        self.assertEqual([item.candidate.username
+                          for item in suggestions(self.users['a'])],
+                         ['d', 'f'])
+
+    def test_pages_show_suggestions(self):
+        client = Client()
+        client.force_login(self.users['a'])
+        etag = client.get(reverse('follow_index'))['ETag']
+        call_command('build_recommendations', stdout=StringIO())
+        response = client.get(reverse('follow_index'),
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['suggestions']), 3)
+        self.assertContains(response, 'Кого почитать')
+        own = client.get(reverse('profile', kwargs={'username': 'a'}))
+        self.assertEqual(len(own.context['suggestions']), 3)
+        other = client.get(reverse('profile', kwargs={'username': 'b'}))
+        self.assertIsNone(other.context['suggestions'])
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+
+from yatube.db.routers import (STICKY_COOKIE, ReplicaRoutingMiddleware,
+                               primary)
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def route(self, method, url, cookies=None):
+        """Прогоняет запрос через middleware, возвращает (базы, ответ)."""
+        request = getattr(self.factory, method)(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+        seen = {}
+
+        def view(request):
+            seen['post'] = Post.objects.all().db
+            seen['session'] = Session.objects.all().db
+            with primary():
+                seen['primary'] = Post.objects.all().db
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return seen, response
+
+    def test_read_views_use_replica(self):
+        seen, response = self.route('get', reverse('index'))
+        self.assertEqual(seen, {'post': 'replica', 'session': 'default',
+                                'primary': 'default'})
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_other_views_and_writes_use_primary(self):
+        urls = (
+            ('get', reverse('new_post')),
+            ('post', reverse('new_post')),
+            ('post', reverse('add_comment', kwargs={'username': 'panda',
+                                                    'post_id': 1})),
+        )
+        for method, url in urls:
+            with self.subTest(value=(method, url)):
+                seen, _ = self.route(method, url)
+                self.assertEqual(seen['post'], 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        _, response = self.route('post', reverse('new_post'))
+        cookie = response.cookies[STICKY_COOKIE]
+        seen, _ = self.route('get', reverse('index'),
+                             cookies={STICKY_COOKIE: cookie.value})
+        self.assertEqual(seen['post'], 'default')
+
+        seen, _ = self.route('get', reverse('index'),
+                             cookies={STICKY_COOKIE: '0'})
+        self.assertEqual(seen['post'], 'replica')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(Post.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        seen, _ = self.route('get', reverse('index'))
+        self.assertEqual(seen['post'], 'default')
@@ -0,0 +1,93 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, SearchToken
+from ..paginators import PAGE_SIZE
+from ..search import search_posts, tokenize
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        cls.bamboo = Post.objects.create(
+            text='Панда ест бамбук, бамбук и ещё раз бамбук',
+            author=cls.user)
+        cls.sleep = Post.objects.create(text='Панда спит весь день',
+                                        author=cls.user)
+        cls.once = Post.objects.create(text='Сегодня бамбук закончился',
+                                       author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_tokenize_normalizes_words(self):
+        self.assertEqual(tokenize('Ёлка, ЁЖИК и я!'), ['елка', 'ежик'])
+
+    def test_results_contain_all_terms_ranked_by_relevance(self):
+        self.assertEqual(list(search_posts('бамбук')),
+                         [self.bamboo, self.once])
+        self.assertEqual(list(search_posts('панда бамбук')), [self.bamboo])
+        self.assertEqual(list(search_posts('енот')), [])
+        self.assertEqual(list(search_posts('')), [])
+
+    def test_index_follows_post_changes(self):
+        self.sleep.text = 'Енот спит весь день'
+        self.sleep.save()
+        self.assertEqual(list(search_posts('енот')), [self.sleep])
+        self.assertEqual(list(search_posts('панда спит')), [])
+
+        self.sleep.delete()
+        self.assertEqual(list(search_posts('енот')), [])
+        self.assertFalse(SearchToken.objects.filter(term='енот').exists())
+
+    def test_search_view_paginates_results(self):
+        Post.objects.bulk_create(
+            Post(text=f'Бамбуковый лес {number}', author=self.user)
+            for number in range(PAGE_SIZE + 1))
+        call_command('rebuild_search_index', missing=True, stdout=StringIO())
+
+        response = self.client.get(reverse('search'), {'q': 'бамбуковый лес'})
+        page = response.context['page']
+        self.assertEqual(len(page), PAGE_SIZE)
+        self.assertNotIn('paginator', response.context)
+        self.assertContains(response, '?q=%D0%B1%D0%B0%D0%BC%D0%B1%D1%83'
+                                      '%D0%BA%D0%BE%D0%B2%D1%8B%D0%B9%20'
+                                      '%D0%BB%D0%B5%D1%81&amp;after='
+                                      f'{PAGE_SIZE}')
+
+        response = self.client.get(reverse('search'),
+                                   {'q': 'бамбуковый лес',
+                                    'after': page.next_cursor})
+        page = response.context['page']
+        self.assertEqual(len(page), 1)
+        self.assertIsNone(page.next_cursor)
+
+        response = self.client.get(reverse('search'),
+                                   {'q': 'бамбуковый лес',
+                                    'before': page.previous_cursor})
+        self.assertEqual(len(response.context['page']), PAGE_SIZE)
+
+    def test_results_are_bounded(self):
+        with mock.patch('posts.search.MAX_RESULTS', 1):
+            self.assertEqual(list(search_posts('бамбук')), [self.bamboo])
+            self.assertEqual(list(search_posts('бамбук', offset=1)), [])
+
+    def test_rebuild_runs_in_batches(self):
+        SearchToken.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=2, stdout=out)
+        self.assertEqual(out.getvalue().count('Проиндексировано до id'), 2)
+        self.assertIn('Проиндексировано публикаций: 3', out.getvalue())
+        self.assertEqual(list(search_posts('бамбук')),
+                         [self.bamboo, self.once])
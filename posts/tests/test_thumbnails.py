@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..imaging import supported_formats
+from ..models import Post
+from ..thumbnails import (THUMBNAIL_SIZE, VARIANT_FORMATS, VARIANT_WIDTHS,
+                           ready_thumbnail, thumbnail_name, variant_name,
+                           variant_size)
+
+User = get_user_model()
+
+
+def make_image(name='big.png', size=(1200, 800)):
+    content = BytesIO()
+    Image.new('RGB', size, color=(255, 0, 0)).save(content, 'PNG')
+    return SimpleUploadedFile(name=name, content=content.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(POSTS_THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.user = User.objects.create_user(username='panda')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_new_post_generates_thumbnail(self):
+        self.authorized_client.post(reverse('new_post'),
+                                    data={'text': 'С картинкой',
+                                          'image': make_image()})
+        post = Post.objects.get(text='С картинкой')
+        name = thumbnail_name(post.image.name)
+        self.assertTrue(default_storage.exists(name))
+        with Image.open(default_storage.path(name)) as image:
+            self.assertEqual(image.size, THUMBNAIL_SIZE)
+
+        for image_format in supported_formats(VARIANT_FORMATS):
+            for width in VARIANT_WIDTHS:
+                with self.subTest(value=(image_format, width)):
+                    variant = variant_name(post.image.name, width,
+                                           image_format)
+                    with Image.open(default_storage.path(variant)) as image:
+                        self.assertEqual(image.size, variant_size(width))
+                        self.assertEqual(image.format, image_format)
+
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, default_storage.url(name))
+        self.assertContains(response, ready_thumbnail(post.image)['srcset'])
+
+    def test_original_is_rendered_until_thumbnail_is_ready(self):
+        with mock.patch('posts.views.schedule_thumbnail') as schedule:
+            self.authorized_client.post(reverse('new_post'),
+                                        data={'text': 'С картинкой',
+                                              'image': make_image()})
+        post = Post.objects.get(text='С картинкой')
+        schedule.assert_called_once_with(post.image)
+        self.assertIsNone(ready_thumbnail(post.image))
+
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, post.image.url)
+
+    def test_command_backfills_missing_thumbnails(self):
+        post = Post.objects.create(text='Старая', author=self.user)
+        post.image.save('old.png', make_image('old.png'))
+        out = StringIO()
+        call_command('generate_thumbnails', workers=0, stdout=out)
+        self.assertIsNotNone(ready_thumbnail(post.image))
+        self.assertIn('Создано миниатюр: 1', out.getvalue())
+
+        out = StringIO()
+        call_command('generate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Создано миниатюр: 0', out.getvalue())
+
+    def test_variant_names_are_deterministic(self):
+        self.assertEqual(variant_name('posts/cat.png', 480, 'WEBP'),
+                         'posts/thumbs/cat.png.480x170.webp')
+        self.assertEqual(thumbnail_name('posts/cat.png'),
+                         'posts/thumbs/cat.png.960x339.jpg')
@@ -0,0 +1,139 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry, UserStats
+from ..paginators import CursorPaginator
+from ..timeline import get_timeline_store
+
+User = get_user_model()
+
+
+class TimelineStoreTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='panda')
+        cls.author = User.objects.create_user(username='bear')
+        cls.other = User.objects.create_user(username='wolf')
+        cls.old_post = Post.objects.create(text='Старая история',
+                                           author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.store = get_timeline_store()
+
+    def expected_feed(self):
+        return tuple(Post.objects.filter(
+            author__following__user=self.reader))
+
+    def test_follow_backfills_existing_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(tuple(self.store.feed(self.reader)),
+                         self.expected_feed())
+
+    def test_new_post_is_fanned_out(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новая история', author=self.author)
+        Post.objects.create(text='Чужая история', author=self.other)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(tuple(self.store.feed(self.reader)),
+                         self.expected_feed())
+
+    def test_unfollow_trims_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(tuple(self.store.feed(self.reader)), ())
+
+    @override_settings(POSTS_TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_posts_are_pulled(self):
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.store.sync(), (1, 0))
+        post = Post.objects.create(text='Новая история', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(tuple(self.store.feed(self.reader)),
+                         self.expected_feed())
+
+    @override_settings(POSTS_TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_pages_merge_pushed_and_pulled_posts(self):
+        fox = User.objects.create_user(username='fox')
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=fox)
+        self.store.sync()
+        for number in range(3):
+            Post.objects.create(text=f'Лиса {number}', author=fox)
+            Post.objects.create(text=f'Медведь {number}', author=self.author)
+        feed = self.store.feed(self.reader)
+        expected = self.expected_feed()
+        paginator = CursorPaginator(feed, per_page=2)
+        page = paginator.get_page()
+        shown = list(page)
+        while page.next_cursor:
+            page = paginator.get_page(after=page.next_cursor)
+            shown.extend(page)
+        self.assertEqual(tuple(shown), expected)
+        page = paginator.get_page(before=page.previous_cursor)
+        self.assertEqual(tuple(page), expected[4:6])
+        pages = Paginator(feed, 2)
+        self.assertEqual(pages.count, len(expected))
+        self.assertEqual(tuple(pages.page(2)), expected[2:4])
+
+    @override_settings(POSTS_TIMELINE_CELEBRITY_FOLLOWERS=2,
+                       POSTS_TIMELINE_FANOUT_FOLLOWERS=2)
+    def test_author_crossing_threshold_keeps_posts_in_feeds(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertEqual(self.store.sync(), (1, 0))
+        self.assertTrue(UserStats.objects.get(user=self.author).pulled)
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.author).exists())
+        post = Post.objects.create(text='Пока знаменит', author=self.author)
+        self.assertEqual(tuple(self.store.feed(self.reader)),
+                         self.expected_feed())
+
+        Follow.objects.filter(user=self.other, author=self.author).delete()
+        self.assertEqual(self.store.sync(), (0, 1))
+        self.assertFalse(UserStats.objects.get(user=self.author).pulled)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)),
+            {post.pk, self.old_post.pk})
+        self.assertEqual(tuple(self.store.feed(self.reader)),
+                         self.expected_feed())
+
+    @override_settings(POSTS_TIMELINE_CELEBRITY_FOLLOWERS=3,
+                       POSTS_TIMELINE_FANOUT_FOLLOWERS=2)
+    def test_toggling_at_threshold_does_not_fan_out_again(self):
+        fox = User.objects.create_user(username='fox')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=fox, author=self.author)
+        # Запрос подписки ленты не перекладывает.
+        self.assertEqual(TimelineEntry.objects.filter(
+            author=self.author).count(), 3)
+        self.assertEqual(self.store.sync(), (1, 0))
+        for _ in range(3):
+            Follow.objects.filter(user=fox, author=self.author).delete()
+            self.assertEqual(self.store.sync(), (0, 0))
+            Follow.objects.create(user=fox, author=self.author)
+            self.assertEqual(self.store.sync(), (0, 0))
+            self.assertFalse(TimelineEntry.objects.filter(
+                author=self.author).exists())
+        self.assertEqual(tuple(self.store.feed(fox)),
+                         (self.old_post,))
+
+    def test_sync_timelines_command(self):
+        output = StringIO()
+        call_command('sync_timelines', stdout=output)
+        self.assertIn('Переведено в подтягивание: 0', output.getvalue())
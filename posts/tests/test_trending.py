@@ -0,0 +1,90 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Group, Post, TrendingBucket
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.group = Group.objects.create(title='Бамбук', slug='bamboo')
+        self.post = Post.objects.create(text='История', author=self.author,
+                                        group=self.group)
+        self.other = Post.objects.create(text='Другая', author=self.author)
+        self.client = Client()
+
+    def score(self, instance):
+        instance.refresh_from_db()
+        return instance.trending_score
+
+    def test_events_update_buckets_and_scores(self):
+        Comment.objects.create(text='Ура', author=self.author,
+                               post=self.post)
+        Comment.objects.create(text='Ещё', author=self.author,
+                               post=self.post)
+        self.assertEqual(self.score(self.post), 4.0)
+        self.assertEqual(self.score(self.group), 4.0)
+        self.assertEqual(self.score(self.other), 2.0)
+        bucket = TrendingBucket.objects.get(post=self.post)
+        self.assertEqual((bucket.comments, bucket.posts), (2, 1))
+
+    def test_roll_decays_and_drops_old_buckets(self):
+        now = timezone.now()
+        with self.settings(POSTS_TRENDING_HALF_LIFE_HOURS=6,
+                           POSTS_TRENDING_WINDOW_HOURS=48):
+            trending.roll(now + timedelta(hours=6))
+            self.assertAlmostEqual(self.score(self.post), 1.0)
+            self.assertAlmostEqual(self.score(self.group), 1.0)
+            trending.roll(now + timedelta(hours=50))
+        self.assertEqual(self.score(self.post), 0)
+        self.assertFalse(TrendingBucket.objects.exists())
+
+    def test_rebuild_matches_incremental_scores(self):
+        Comment.objects.create(text='Ура', author=self.author,
+                               post=self.other)
+        now = timezone.now()
+        trending.roll(now)
+        expected = [(post.pk, post.trending_score)
+                    for post in trending.trending_posts()]
+        TrendingBucket.objects.all().delete()
+        Post.objects.update(trending_score=0)
+        trending.rebuild(now)
+        self.assertEqual([(post.pk, post.trending_score)
+                          for post in trending.trending_posts()], expected)
+        self.assertEqual(list(trending.trending_groups()), [self.group])
+
+    def test_ranking_and_page(self):
+        for _ in range(3):
+            Comment.objects.create(text='Ура', author=self.author,
+                                   post=self.other)
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(list(response.context['page']),
+                         [self.other, self.post])
+        self.assertEqual(list(response.context['groups']), [self.group])
+
+    def test_page_is_cached_until_roll(self):
+        self.client.get(reverse('trending'))
+        Comment.objects.create(text='Ура', author=self.author,
+                               post=self.post)
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(response.context['page'][0], self.other)
+        trending.roll()
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(response.context['page'][0], self.post)
+
+    def test_roll_trending_command(self):
+        output = StringIO()
+        call_command('roll_trending', '--rebuild', stdout=output)
+        self.assertTrue(output.getvalue())
+        self.assertEqual(self.score(self.post), 2.0)
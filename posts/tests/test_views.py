@@ -8,15 +8,19 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.flatpages.models import FlatPage
 from django.contrib.flatpages.models import Site
+from django.db import connection
 from django.db.models.query import QuerySet
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Post, Group, Comment, Follow
+from .query_budget import query_budget
 
 User = get_user_model()
 
 
+@query_budget
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -103,6 +107,7 @@ class PostViewsTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -296,28 +301,35 @@ class PostViewsTests(TestCase):
                 self.assertEqual(actual_value, expected_value)
 
     def test_cache(self):
+        post_url = reverse('post', kwargs={'username': self.user.username,
+                                           'post_id': self.post_second.pk})
+        self.authorized_client.get(reverse('index'))
+        Post.objects.filter(pk=self.post_second.pk).update(text='dummy')
         response = self.authorized_client.get(reverse('index'))
-        init_content = response.content
-        dummy_post = Post.objects.create(author=self.user,
-                                         text='dummy')
-        response = self.authorized_client.get(reverse('index'))
-        cached_init_content = response.content
-        self.assertEqual(init_content, cached_init_content)
+        self.assertNotContains(response, 'dummy')
 
-        cache.clear()
+        self.post_second.refresh_from_db()
+        self.post_second.save()
         response = self.authorized_client.get(reverse('index'))
-        updated_post_content = response.content
-        self.assertNotEqual(updated_post_content, cached_init_content)
+        self.assertContains(response, 'dummy')
+        self.assertContains(response, post_url + 'edit/')
 
-        dummy_post.delete()
+    def test_cached_cards_keep_viewer_controls(self):
+        edit_url = reverse('post_edit',
+                           kwargs={'username': self.user.username,
+                                   'post_id': self.post_second.pk})
         response = self.authorized_client.get(reverse('index'))
-        cached_post_content = response.content
-        self.assertEqual(cached_post_content, updated_post_content)
+        self.assertContains(response, edit_url)
 
-        cache.clear()
-        response = self.authorized_client.get(reverse('index'))
-        refreshed_content = response.content
-        self.assertEqual(refreshed_content, init_content)
+        stranger_client = Client()
+        stranger_client.force_login(self.user_wrong)
+        response = stranger_client.get(reverse('index'))
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, 'Добавить комментарий')
+
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, edit_url)
+        self.assertNotContains(response, 'Добавить комментарий')
 
     def test_user_may_follow_new(self):
         current_subscriptions = User.objects.filter(following__user=self.user)
@@ -361,3 +373,50 @@ class PostViewsTests(TestCase):
             response = self.guest_client.get(post_url)
             actual_value = tuple(response.context.get('comments'))
             self.assertEqual(actual_value, expected_value)
+
+
+@query_budget
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='panda')
+        cls.reader = User.objects.create_user(username='wolf')
+        cls.group = Group.objects.create(title='pandas group',
+                                         slug='pandas',
+                                         description='Pandas stories')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(text=f'Про панду история {i}',
+                                       author=self.user,
+                                       group=self.group)
+            Comment.objects.create(text='Коментарий',
+                                   author=self.reader,
+                                   post=post)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('follow_index'),
+        )
+        self.add_posts(2)
+        small_pages = {url: self.count_queries(url) for url in urls}
+        self.add_posts(10)
+        for url in urls:
+            with self.subTest(value=url):
+                self.assertEqual(self.count_queries(url), small_pages[url])
@@ -0,0 +1,126 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+
+from .imaging import render_variants, supported_formats
+from .instrumentation import timer
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (960, 339)
+VARIANT_WIDTHS = (480, 960, 1440)
+VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+VARIANT_SIZES = '(max-width: 960px) 100vw, 960px'
+
+EXTENSIONS = {'AVIF': 'avif', 'WEBP': 'webp', 'JPEG': 'jpg'}
+MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp',
+              'JPEG': 'image/jpeg'}
+
+_executor = None
+
+
+def variant_size(width):
+    return (width, round(width * THUMBNAIL_SIZE[1] / THUMBNAIL_SIZE[0]))
+
+
+def variant_name(image_name, width, image_format):
+    """Детерминированное имя варианта рядом с оригиналом.
+
+    Имя однозначно задаётся именем оригинала, размером и форматом,
+    поэтому файл можно отдавать с вечным кешированием.
+    """
+    directory, filename = os.path.split(image_name)
+    width, height = variant_size(width)
+    return os.path.join(
+        directory, 'thumbs',
+        f'{filename}.{width}x{height}.{EXTENSIONS[image_format]}')
+
+
+def thumbnail_name(image_name):
+    """Основная миниатюра; её появление означает готовность всех вариантов."""
+    return variant_name(image_name, THUMBNAIL_SIZE[0], 'JPEG')
+
+
+def variants(image_name):
+    """Список ``(имя, размер, формат)``, основная миниатюра последней."""
+    main = (thumbnail_name(image_name), THUMBNAIL_SIZE, 'JPEG')
+    result = [(variant_name(image_name, width, image_format),
+               variant_size(width), image_format)
+              for image_format in supported_formats(VARIANT_FORMATS)
+              for width in VARIANT_WIDTHS]
+    result.remove(main)
+    result.append(main)
+    return result
+
+
+def srcset(image_name, image_format):
+    return ', '.join(
+        f'{default_storage.url(variant_name(image_name, width, image_format))}'
+        f' {width}w'
+        for width in VARIANT_WIDTHS)
+
+
+def ready_thumbnail(image):
+    """Описание готовых вариантов для <picture> или None.
+
+    Ничего не создаёт: пока фоновый пул не записал основную миниатюру,
+    возвращается None и шаблон показывает оригинал.
+    """
+    if not image:
+        return None
+    try:
+        if not default_storage.exists(thumbnail_name(image.name)):
+            return None
+    except SuspiciousFileOperation:
+        logger.warning('image %s is outside of MEDIA_ROOT', image.name)
+        return None
+    return {
+        'src': default_storage.url(thumbnail_name(image.name)),
+        'srcset': srcset(image.name, 'JPEG'),
+        'sizes': VARIANT_SIZES,
+        'sources': [{'type': MIME_TYPES[image_format],
+                     'srcset': srcset(image.name, image_format)}
+                    for image_format in supported_formats(VARIANT_FORMATS)
+                    if image_format != 'JPEG'],
+    }
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def thumbnail_job(image_name):
+    return (default_storage.path(image_name),
+            [(default_storage.path(name), size, image_format)
+             for name, size, image_format in variants(image_name)])
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error('thumbnail generation failed',
+                     exc_info=future.exception())
+
+
+def schedule_thumbnail(image):
+    """Ставит создание вариантов изображения в фоновый пул процессов."""
+    if not image:
+        return
+    job = thumbnail_job(image.name)
+    with timer('thumbnail'):
+        if not settings.POSTS_THUMBNAIL_WORKERS:
+            render_variants(*job)
+            return
+        get_executor().submit(render_variants, *job).add_done_callback(
+            _log_failure)
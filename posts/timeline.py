@@ -0,0 +1,300 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+BATCH_SIZE = 500
+
+
+def celebrity_threshold():
+    return getattr(settings, 'POSTS_TIMELINE_CELEBRITY_FOLLOWERS', 1000)
+
+
+def fanout_threshold():
+    """Порог возврата к раскладке, не выше порога подтягивания."""
+    return min(getattr(settings, 'POSTS_TIMELINE_FANOUT_FOLLOWERS', 800),
+               celebrity_threshold())
+
+
+def backfill_limit():
+    return getattr(settings, 'POSTS_TIMELINE_BACKFILL', 1000)
+
+
+class DatabaseTimelineStore:
+    """Лента подписок, материализованная в таблице TimelineEntry.
+
+    Публикация обычного автора раскладывается по лентам подписчиков
+    при сохранении (fan-out on write). Публикации авторов, у которых
+    подписчиков не меньше порога, в ленты не раскладываются и
+    подтягиваются при чтении (pull). Какой способ действует, хранит
+    флаг UserStats.pulled; его переключает sync() из команды
+    sync_timelines, а не запросы подписки и отписки.
+    """
+
+    def sync(self, author_ids=None):
+        """Переключает авторов ``author_ids`` или всех между раскладкой
+        и подтягиванием.
+
+        Автор начинает подтягиваться, когда подписчиков не меньше
+        celebrity_threshold(), и снова раскладывается, когда их меньше
+        fanout_threshold(). Между порогами флаг не меняется, поэтому
+        подписки и отписки на границе ничего не перекладывают. Перешедший
+        порог автор убирается из лент, опустившийся ниже раскладывается
+        заново по лентам всех подписчиков: иначе публикации и подписки
+        времён подтягивания пропали бы из лент.
+
+        Возвращает (число переведённых в подтягивание, число
+        возвращённых к раскладке).
+        """
+        stats = UserStats.objects.all()
+        if author_ids is not None:
+            stats = stats.filter(user_id__in=author_ids)
+        promote = list(stats.filter(
+            pulled=False, follower_count__gte=celebrity_threshold())
+            .values_list('user_id', flat=True))
+        demote = list(stats.filter(
+            pulled=True, follower_count__lt=fanout_threshold())
+            .values_list('user_id', flat=True))
+        promoted = demoted = 0
+        for author_id in promote:
+            with transaction.atomic():
+                # Переключает только тот, кто успел сменить флаг.
+                if (UserStats.objects.filter(user_id=author_id, pulled=False)
+                        .update(pulled=True)):
+                    self.drop_author(author_id)
+                    promoted += 1
+        for author_id in demote:
+            with transaction.atomic():
+                if (UserStats.objects.filter(user_id=author_id, pulled=True)
+                        .update(pulled=False)):
+                    self.backfill_author(author_id)
+                    demoted += 1
+        return promoted, demoted
+
+    def drop_author(self, author_id):
+        followers = Follow.objects.filter(author_id=author_id)
+        TimelineEntry.objects.filter(
+            user_id__in=followers.values('user_id'),
+            author_id=author_id).delete()
+
+    def backfill_author(self, author_id):
+        """Раскладывает последние публикации автора по лентам всех его
+        подписчиков одним INSERT ... SELECT."""
+        ops = connection.ops
+        quote = ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{ops.insert_statement(ignore_conflicts=True)} '
+                f'{quote(TimelineEntry._meta.db_table)} '
+                f'(user_id, author_id, post_id, pub_date) '
+                f'SELECT f.user_id, p.author_id, p.id, p.pub_date '
+                f'FROM {quote(Follow._meta.db_table)} f '
+                f'INNER JOIN (SELECT id, author_id, pub_date '
+                f'FROM {quote(Post._meta.db_table)} WHERE author_id = %s '
+                f'ORDER BY pub_date DESC, id DESC LIMIT %s) p '
+                f'ON p.author_id = f.author_id '
+                f'WHERE f.author_id = %s '
+                f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+                [author_id, backfill_limit(), author_id])
+
+    def pushed_follower_ids(self, author_id):
+        """Подписчики, в ленты которых раскладываются публикации автора."""
+        return list(Follow.objects
+                    .filter(author_id=author_id, author__stats__pulled=False)
+                    .values_list('user_id', flat=True))
+
+    def pulled_among(self, author_ids):
+        """Авторы из ``author_ids``, чьи публикации подтягиваются."""
+        return set(UserStats.objects
+                   .filter(user_id__in=author_ids, pulled=True)
+                   .values_list('user_id', flat=True))
+
+    def pulled_author_ids(self, user):
+        """Авторы из подписок, чьи публикации подтягиваются при чтении."""
+        return list(Follow.objects
+                    .filter(user=user, author__stats__pulled=True)
+                    .values_list('author_id', flat=True))
+
+    def push(self, post):
+        entries = [TimelineEntry(user_id=user_id,
+                                 author_id=post.author_id,
+                                 post_id=post.pk,
+                                 pub_date=post.pub_date)
+                   for user_id in self.pushed_follower_ids(post.author_id)]
+        TimelineEntry.objects.bulk_create(entries,
+                                          batch_size=BATCH_SIZE,
+                                          ignore_conflicts=True)
+
+    def follow(self, user_id, author_id):
+        if self.pulled_among([author_id]):
+            return
+        posts = (Post.objects.filter(author_id=author_id)
+                 .order_by('-pub_date', '-pk')
+                 .values_list('pk', 'pub_date')[:backfill_limit()])
+        entries = [TimelineEntry(user_id=user_id,
+                                 author_id=author_id,
+                                 post_id=post_id,
+                                 pub_date=pub_date)
+                   for post_id, pub_date in posts]
+        TimelineEntry.objects.bulk_create(entries,
+                                          batch_size=BATCH_SIZE,
+                                          ignore_conflicts=True)
+
+    def follow_many(self, edges):
+        """Как follow() для пар (user_id, author_id); публикации каждого
+        автора читаются один раз на всех его новых подписчиков."""
+        edges = list(edges)
+        pulled = self.pulled_among({author_id for _, author_id in edges})
+        followers = defaultdict(list)
+        for user_id, author_id in edges:
+            if author_id not in pulled:
+                followers[author_id].append(user_id)
+        for author_id, user_ids in followers.items():
+            posts = list(Post.objects.filter(author_id=author_id)
+                         .order_by('-pub_date', '-pk')
+                         .values_list('pk', 'pub_date')[:backfill_limit()])
+            entries = [TimelineEntry(user_id=user_id,
+                                     author_id=author_id,
+                                     post_id=post_id,
+                                     pub_date=pub_date)
+                       for user_id in user_ids
+                       for post_id, pub_date in posts]
+            TimelineEntry.objects.bulk_create(entries,
+                                              batch_size=BATCH_SIZE,
+                                              ignore_conflicts=True)
+
+    def rebuild(self):
+        """Заново выставляет флаги подтягивания по счётчикам и
+        раскладывает ленты из подписок одним INSERT ... SELECT, например
+        после загрузки данных в обход сигналов.
+
+        В отличие от follow() глубина ленты не ограничивается
+        POSTS_TIMELINE_BACKFILL.
+        """
+        threshold = celebrity_threshold()
+        UserStats.objects.filter(follower_count__gte=threshold).update(
+            pulled=True)
+        UserStats.objects.filter(follower_count__lt=threshold).update(
+            pulled=False)
+        quote = connection.ops.quote_name
+        TimelineEntry.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(TimelineEntry._meta.db_table)} '
+                f'(user_id, author_id, post_id, pub_date) '
+                f'SELECT f.user_id, p.author_id, p.id, p.pub_date '
+                f'FROM {quote(Follow._meta.db_table)} f '
+                f'INNER JOIN {quote(Post._meta.db_table)} p '
+                f'ON p.author_id = f.author_id '
+                f'WHERE f.author_id NOT IN ('
+                f'SELECT user_id FROM {quote(UserStats._meta.db_table)} '
+                f'WHERE pulled = %s)',
+                [True],
+            )
+
+    def unfollow(self, user_id, author_id):
+        TimelineEntry.objects.filter(user_id=user_id,
+                                     author_id=author_id).delete()
+
+    def feed(self, user):
+        return TimelineFeed(user, self.pulled_author_ids(user))
+
+
+def _keyset(date_field, pk_field, after=None, before=None):
+    """Условие диапазона после ``after`` или до ``before``, пар
+    (pub_date, id), и порядок, в котором его читать по индексу.
+
+    Порядок задаётся выражениями F: строка ``timeline_entries__post_id``
+    в order_by означала бы сортировку по Post.Meta.ordering.
+    """
+    if after is not None:
+        pub_date, pk = after
+        return ((Q(**{f'{date_field}__lt': pub_date})
+                 | Q(**{date_field: pub_date, f'{pk_field}__lt': pk})),
+                (F(date_field).desc(), F(pk_field).desc()))
+    if before is not None:
+        pub_date, pk = before
+        return ((Q(**{f'{date_field}__gt': pub_date})
+                 | Q(**{date_field: pub_date, f'{pk_field}__gt': pk})),
+                (F(date_field).asc(), F(pk_field).asc()))
+    return Q(), (F(date_field).desc(), F(pk_field).desc())
+
+
+class TimelineFeed:
+    """Лента подписок пользователя для CursorPaginator и Paginator.
+
+    Разложенные публикации читаются диапазоном индекса
+    timeline_user_pub_date_idx, публикации подтягиваемых авторов -
+    диапазоном post_author_pub_date_idx по каждому автору. Каждый
+    диапазон не длиннее страницы, результаты сливаются по (pub_date, id).
+    """
+
+    def __init__(self, user, pulled_author_ids, feed_data=False):
+        self.user = user
+        self.pulled_author_ids = list(pulled_author_ids)
+        self.feed_data = feed_data
+
+    def with_feed_data(self):
+        return TimelineFeed(self.user, self.pulled_author_ids, True)
+
+    def posts(self):
+        posts = Post.objects.all()
+        return posts.with_feed_data() if self.feed_data else posts
+
+    def sources(self, after=None, before=None):
+        """Запросы источников ленты в порядке страницы."""
+        # Условия на TimelineEntry задаются одним filter(), иначе Django
+        # соединил бы таблицу дважды.
+        condition, ordering = _keyset('timeline_entries__pub_date',
+                                      'timeline_entries__post_id',
+                                      after, before)
+        pushed = (self.posts()
+                  .filter(Q(timeline_entries__user=self.user) & condition)
+                  .order_by(*ordering))
+        condition, ordering = _keyset('pub_date', 'pk', after, before)
+        pulled = [self.posts().filter(condition, author_id=author_id)
+                  .order_by(*ordering)
+                  for author_id in self.pulled_author_ids]
+        return [pushed, *pulled]
+
+    def keyset_page(self, after=None, before=None, limit=None):
+        """Первые ``limit`` публикаций после ``after`` или до ``before``;
+        для ``before`` в обратном порядке, как CursorPaginator."""
+        sources = self.sources(after, before)
+        if limit is not None:
+            sources = [source[:limit] for source in sources]
+        merged = heapq.merge(*sources,
+                             key=lambda post: (post.pub_date, post.pk),
+                             reverse=before is None)
+        seen = set()
+        unique = (post for post in merged
+                  if post.pk not in seen and not seen.add(post.pk))
+        return list(itertools.islice(unique, limit))
+
+    def count(self):
+        total = TimelineEntry.objects.filter(user=self.user).count()
+        if self.pulled_author_ids:
+            total += Post.objects.filter(
+                author__in=self.pulled_author_ids).count()
+        return total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.keyset_page(limit=index.stop)[index]
+        return self.keyset_page(limit=index + 1)[index]
+
+    def __iter__(self):
+        return iter(self.keyset_page())
+
+
+def get_timeline_store():
+    store_class = getattr(settings, 'POSTS_TIMELINE_STORE',
+                          'posts.timeline.DatabaseTimelineStore')
+    return import_string(store_class)()
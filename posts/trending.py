@@ -0,0 +1,154 @@
+"""Популярные публикации и группы с затуханием по времени.
+
+Каждый комментарий и каждая новая публикация прибавляют единицу в
+часовую корзину TrendingBucket публикации и её группы и сразу же вес
+в их trending_score. Поэтому лента популярного читается одним запросом
+по индексу, как главная. Раз в час команда roll_trending пересчитывает
+оценки из корзин окна POSTS_TRENDING_WINDOW_HOURS: вклад корзины
+убывает вдвое каждые POSTS_TRENDING_HALF_LIFE_HOURS. Заодно она
+удаляет корзины, выпавшие из окна.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              OuterRef, Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+
+from . import feed_cache
+from .models import Comment, Group, Post, TrendingBucket
+
+
+COMMENT_WEIGHT = 1.0
+POST_WEIGHT = 2.0
+
+
+def half_life():
+    return getattr(settings, 'POSTS_TRENDING_HALF_LIFE_HOURS', 6)
+
+
+def window():
+    return getattr(settings, 'POSTS_TRENDING_WINDOW_HOURS', 48)
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_bucket(cursor, column, object_id, hour, comments, posts):
+    table = connection.ops.quote_name(TrendingBucket._meta.db_table)
+    # ON CONFLICT ... DO UPDATE понимают и SQLite, и PostgreSQL.
+    cursor.execute(
+        f'INSERT INTO {table} ({column}, hour, comments, posts) '
+        f'VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT ({column}, hour) DO UPDATE SET '
+        f'comments = {table}.comments + excluded.comments, '
+        f'posts = {table}.posts + excluded.posts',
+        [object_id, connection.ops.adapt_datetimefield_value(hour),
+         comments, posts])
+
+
+def record(post_id, group_id, comments=0, posts=0, moment=None):
+    """Учитывает события публикации ``post_id`` из группы ``group_id``."""
+    hour = hour_of(moment or timezone.now())
+    weight = comments * COMMENT_WEIGHT + posts * POST_WEIGHT
+    # Без общей транзакции: расхождение оценки с корзинами после сбоя
+    # исправит ближайший roll().
+    with connection.cursor() as cursor:
+        _add_bucket(cursor, 'post_id', post_id, hour, comments, posts)
+        if group_id is not None:
+            _add_bucket(cursor, 'group_id', group_id, hour, comments, posts)
+    Post.objects.filter(pk=post_id).update(
+        trending_score=F('trending_score') + weight)
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            trending_score=F('trending_score') + weight)
+
+
+def record_comment(comment):
+    record(comment.post_id, comment.post.group_id, comments=1,
+           moment=comment.created)
+
+
+def record_post(post):
+    record(post.pk, post.group_id, posts=1, moment=post.pub_date)
+
+
+def decayed_score(now):
+    """Сумма корзин окна с весом 0.5 ** (возраст / период полураспада)."""
+    current = hour_of(now)
+    weights = [When(hour=current - timedelta(hours=age),
+                    then=Value(0.5 ** (age / half_life())))
+               for age in range(window() + 1)]
+    decay = Case(*weights, default=Value(0.0), output_field=FloatField())
+    return ExpressionWrapper(
+        decay * (F('comments') * COMMENT_WEIGHT + F('posts') * POST_WEIGHT),
+        output_field=FloatField())
+
+
+def _refresh(model, field, now):
+    buckets = TrendingBucket.objects.filter(**{f'{field}__isnull': False})
+    total = (buckets.filter(**{field: OuterRef('pk')})
+             .order_by().values(field)
+             .annotate(total=Sum(decayed_score(now))).values('total'))
+    model.objects.filter(pk__in=buckets.values(field)).update(
+        trending_score=Coalesce(Subquery(total, output_field=FloatField()),
+                                Value(0.0)))
+    model.objects.filter(trending_score__gt=0).exclude(
+        pk__in=buckets.values(field)).update(trending_score=0)
+
+
+def roll(now=None):
+    """Удаляет старые корзины и пересчитывает оценки с затуханием."""
+    now = now or timezone.now()
+    cutoff = hour_of(now) - timedelta(hours=window())
+    with transaction.atomic():
+        TrendingBucket.objects.filter(hour__lt=cutoff).delete()
+        _refresh(Post, 'post', now)
+        _refresh(Group, 'group', now)
+    feed_cache.bump(feed_cache.TRENDING_SCOPE)
+
+
+def rebuild(now=None):
+    """Заново раскладывает по корзинам комментарии и публикации окна,
+    например после загрузки данных в обход сигналов."""
+    now = now or timezone.now()
+    cutoff = hour_of(now) - timedelta(hours=window())
+    comments = (Comment.objects.filter(created__gte=cutoff)
+                .annotate(bucket=TruncHour('created')))
+    posts = (Post.objects.filter(pub_date__gte=cutoff)
+             .annotate(bucket=TruncHour('pub_date')))
+    sources = (
+        (comments, 'post', 'post', 'comments'),
+        (comments.filter(post__group__isnull=False), 'post__group',
+         'group', 'comments'),
+        (posts, 'pk', 'post', 'posts'),
+        (posts.filter(group__isnull=False), 'group', 'group', 'posts'),
+    )
+    counts = {}
+    for queryset, key, target, kind in sources:
+        rows = (queryset.order_by().values(key, 'bucket')
+                .annotate(total=Count('pk')))
+        for row in rows:
+            bucket = counts.setdefault(
+                (target, row[key], row['bucket']),
+                {'comments': 0, 'posts': 0})
+            bucket[kind] += row['total']
+    with transaction.atomic():
+        TrendingBucket.objects.all().delete()
+        TrendingBucket.objects.bulk_create(
+            TrendingBucket(**{f'{target}_id': object_id}, hour=hour, **values)
+            for (target, object_id, hour), values in counts.items())
+    roll(now)
+
+
+def trending_posts():
+    return (Post.objects.with_feed_data().filter(trending_score__gt=0)
+            .order_by('-trending_score', '-pk'))
+
+
+def trending_groups(limit=10):
+    return (Group.objects.filter(trending_score__gt=0)
+            .order_by('-trending_score', '-pk')[:limit])
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('',
@@ -12,9 +12,36 @@ urlpatterns = [
     path('new/',
          views.new_post,
          name='new_post'),
+    path('groups/',
+         views.group_list,
+         name='group_list'),
+    path('trending/',
+         views.trending,
+         name='trending'),
+    path('search/',
+         views.search,
+         name='search'),
     path('follow/',
          views.follow_index,
          name='follow_index'),
+    path('api/v1/',
+         api.index,
+         name='api_index'),
+    path('api/v1/group/<slug:slug>/',
+         api.group_posts,
+         name='api_group_posts'),
+    path('api/v1/follow/',
+         api.follow_index,
+         name='api_follow_index'),
+    path('api/v1/follow/bulk/',
+         api.bulk_follow,
+         name='api_bulk_follow'),
+    path('api/v1/<str:username>/',
+         api.profile,
+         name='api_profile'),
+    path('api/v1/<str:username>/<int:post_id>/',
+         api.post_detail,
+         name='api_post'),
     path('<str:username>/',
          views.profile,
          name='profile'),
@@ -24,6 +51,9 @@ urlpatterns = [
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit,
          name='post_edit'),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('<str:username>/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
@@ -0,0 +1,12 @@
+"""Мелкие вспомогательные функции, общие для модулей приложения."""
+import itertools
+
+
+def batched(iterable, size):
+    """Разбивает ``iterable`` на списки не длиннее ``size``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,33 +1,92 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
 
+from yatube.db.routers import primary
+
+from . import feed_cache, feeds, follows
+from .conditional import conditional_response
 from .forms import PostForm, CommentForm
-from .models import Post, Group, Follow
+from .groups import directory, top_posters
+from .models import Post, Group
+from .paginators import (COMMENTS_PAGE_SIZE, PAGE_SIZE, TRENDING_SIZE,
+                         CursorPaginator, comments_after, encode_cursor,
+                         paginate_ranked)
+from .recommendations import suggestions
+from .search import MAX_RESULTS, search_posts
+from .thumbnails import schedule_thumbnail
+from .trending import trending_groups, trending_posts
 
 
 User = get_user_model()
 
 
+# Страницы содержат маскированный CSRF-токен, который меняется от
+# ответа к ответу, поэтому их ETag слабые.
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page,
-                                          'paginator': paginator})
+    latest, scopes = feeds.index_feed()
+
+    def build():
+        page, paginator = feed_cache.paginate_cached(request, latest, scopes)
+        return render(request, 'index.html', {'page': page,
+                                              'paginator': paginator})
+    return conditional_response(request, scopes, build, weak=True)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html', {'group': group,
-                                          'page': page,
-                                          'paginator': paginator})
+    posts, scopes = feeds.group_feed(group)
+
+    def build():
+        page, paginator = feed_cache.paginate_cached(request, posts, scopes)
+        return render(request, 'group.html', {
+            'group': group,
+            'page': page,
+            'paginator': paginator,
+            'top_posters': top_posters(group),
+        })
+    return conditional_response(
+        request, [*scopes, feed_cache.GROUPS_SCOPE], build, weak=True)
+
+
+def group_list(request):
+    paginator = CursorPaginator(directory(), field='last_activity')
+    page = paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    return render(request, 'groups.html', {'page': page})
+
+
+def trending(request):
+    def compute():
+        with primary():
+            return (list(trending_posts()[:TRENDING_SIZE]),
+                    list(trending_groups()))
+
+    key, stale_key = feed_cache.feed_keys(
+        (feed_cache.ALL_SCOPE, feed_cache.TRENDING_SCOPE), request)
+    posts, groups = feed_cache.get_or_compute(
+        key, stale_key, compute,
+        getattr(settings, 'POSTS_TRENDING_CACHE_TIMEOUT', 60))
+    paginator = Paginator(posts, PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'trending.html', {'groups': groups,
+                                             'page': page,
+                                             'paginator': paginator})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = Post.objects.with_feed_data()
+    page = paginate_ranked(
+        request,
+        lambda offset, limit: search_posts(query, posts, offset, limit),
+        limit=MAX_RESULTS)
+    return render(request, 'search.html', {'query': query, 'page': page})
 
 
 @login_required
@@ -39,6 +98,7 @@ def new_post(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            schedule_thumbnail(post.image)
             return redirect('index')
         return render(request, 'new_post.html', {'form': form})
     form = PostForm()
@@ -46,30 +106,78 @@ def new_post(request):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        following = author.following.filter(user=request.user).exists()
-    author_posts = author.posts.all()
-    paginator = Paginator(author_posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'profile.html', {'author': author,
-                                            'following': following,
-                                            'page': page,
-                                            'paginator': paginator})
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    author_posts, scopes = feeds.profile_feed(author)
+    own_profile = request.user == author
+
+    def build():
+        following = False
+        if request.user.is_authenticated and not own_profile:
+            following = author.following.filter(user=request.user).exists()
+        page, paginator = feed_cache.paginate_cached(
+            request, author_posts, scopes)
+        return render(request, 'profile.html', {
+            'author': author,
+            'following': following,
+            'page': page,
+            'paginator': paginator,
+            'suggestions': suggestions(author) if own_profile else None,
+        })
+    return conditional_response(
+        request, [*scopes, feed_cache.RECOMMENDATIONS_SCOPE], build,
+        weak=True)
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post,
+    post = get_object_or_404(Post.objects.with_feed_data()
+                             .select_related('author__stats'),
+                             pk=post_id,
+                             author__username=username)
+
+    def build():
+        comments = comments_after(post.comments.all())[:COMMENTS_PAGE_SIZE]
+        shown = list(comments)
+        next_comments = None
+        if shown and post.comment_count > len(shown):
+            next_comments = comments_url(post.author.username, post.pk,
+                                         encode_cursor(shown[-1], 'created'))
+        form = CommentForm()
+        return render(request, 'post.html', {'author': post.author,
+                                             'comments': comments,
+                                             'next_comments': next_comments,
+                                             'post': post,
+                                             'form': form})
+    return conditional_response(request, feeds.post_detail_scopes(post),
+                                build, weak=True)
+
+
+def comments_url(username, post_id, cursor):
+    url = reverse('post_comments',
+                  kwargs={'username': username, 'post_id': post_id})
+    return f'{url}?after={cursor}'
+
+
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев: HTML-фрагмент и адрес продолжения."""
+    post = get_object_or_404(Post.objects.only('pk', 'author_id'),
                              pk=post_id,
                              author__username=username)
-    comments = post.comments.all()
-    form = CommentForm()
-    return render(request, 'post.html', {'author': post.author,
-                                         'comments': comments,
-                                         'post': post,
-                                         'form': form})
+
+    def build():
+        comments = list(comments_after(post.comments.all(),
+                                       request.GET.get('after'))
+                        [:COMMENTS_PAGE_SIZE + 1])
+        next_comments = None
+        if len(comments) > COMMENTS_PAGE_SIZE:
+            comments = comments[:COMMENTS_PAGE_SIZE]
+            next_comments = comments_url(
+                username, post_id, encode_cursor(comments[-1], 'created'))
+        html = render_to_string('includes/comment_list.html',
+                                {'comments': comments}, request)
+        return JsonResponse({'html': html, 'next': next_comments})
+    return conditional_response(request, feeds.post_detail_scopes(post),
+                                build)
 
 
 @login_required
@@ -84,7 +192,10 @@ def post_edit(request, username, post_id):
                           instance=original_post)
     if bound_form.is_valid():
         updated_post = bound_form.save(commit=False)
-        updated_post.save()
+        # Счётчики и оценку, сдвинутые за время запроса, не затираем.
+        updated_post.save(update_fields=[*PostForm.Meta.fields, 'updated'])
+        if 'image' in bound_form.changed_data:
+            schedule_thumbnail(updated_post.image)
         return redirect('post', username=username, post_id=post_id)
     return render(request, 'new_post.html', {'form': bound_form,
                                              'post': original_post})
@@ -107,30 +218,34 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    following_posts = Post.objects.filter(author__following__user=request.user).all()
-    paginator = Paginator(following_posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'follow.html', {'page': page,
-                                           'paginator': paginator})
+    following_posts, scopes = feeds.follow_feed(request.user)
+
+    def build():
+        page, paginator = feed_cache.paginate_cached(
+            request, following_posts, scopes)
+        return render(request, 'follow.html', {
+            'page': page,
+            'paginator': paginator,
+            'suggestions': suggestions(request.user),
+        })
+    return conditional_response(
+        request, [*scopes, feed_cache.RECOMMENDATIONS_SCOPE], build,
+        weak=True)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        if not author.following.filter(user=request.user).exists():
-            Follow.objects.create(user=request.user,
-                                  author=author)
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    follows.follow(request.user.pk, author.pk)
     return redirect('profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    binding = Follow.objects.filter(author__username=username,
-                                    user=request.user)
-    if binding.exists():
-        binding.delete()
+    author_id = (User.objects.filter(username=username)
+                 .values_list('pk', flat=True).first())
+    if author_id is not None:
+        follows.unfollow(request.user.pk, author_id)
     return redirect('profile', username=username)
 
 
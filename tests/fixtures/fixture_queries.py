@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture
+def query_budget():
+    from posts.tests.query_budget import guard
+    with guard():
+        yield
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+
+@pytest.fixture
+def feed_data(user, group, django_user_model):
+    from posts.models import Comment, Follow, Post
+    author = django_user_model.objects.create_user(username='Author')
+    Follow.objects.create(user=user, author=author)
+    for number in range(12):
+        post = Post.objects.create(text=f'Пост номер {number}', author=author, group=group)
+        Comment.objects.create(text='Комментарий', author=user, post=post)
+    own_post = Post.objects.create(text='Свой пост', author=user, group=group)
+    return author, post, own_post
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_every_url_has_budget(self):
+        from posts.tests.query_budget import load_budgets
+        from posts.urls import urlpatterns
+        names = {pattern.name for pattern in urlpatterns}
+        assert names == set(load_budgets()), \
+            'Проверьте, что для каждого адреса из posts/urls.py задан бюджет в query_budgets.json'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_stay_within_budget(self, user_client, group, feed_data, query_budget):
+        author, post, own_post = feed_data
+        post_kwargs = {'username': author.username, 'post_id': post.id}
+        own_kwargs = {'username': own_post.author.username, 'post_id': own_post.id}
+        requests = (
+            ('get', reverse('index'), None),
+            ('get', reverse('index') + '?page=2', None),
+            ('get', reverse('group_posts', kwargs={'slug': group.slug}), None),
+            ('get', reverse('group_posts', kwargs={'slug': group.slug}) + '?page=2', None),
+            ('get', reverse('new_post'), None),
+            ('post', reverse('new_post'), {'text': 'Новый пост', 'group': group.id}),
+            ('get', reverse('search') + '?q=пост', None),
+            ('get', reverse('trending'), None),
+            ('get', reverse('group_list'), None),
+            ('get', reverse('follow_index'), None),
+            ('get', reverse('follow_index') + '?page=2', None),
+            ('get', reverse('profile', kwargs={'username': author.username}), None),
+            ('get', reverse('profile', kwargs={'username': author.username}) + '?page=2', None),
+            ('get', reverse('post', kwargs=post_kwargs), None),
+            ('get', reverse('post_comments', kwargs=post_kwargs), None),
+            ('get', reverse('post_edit', kwargs=own_kwargs), None),
+            ('post', reverse('post_edit', kwargs=own_kwargs), {'text': 'Исправленный пост'}),
+            ('post', reverse('add_comment', kwargs=post_kwargs), {'text': 'Ещё комментарий'}),
+            ('get', reverse('profile_unfollow', kwargs={'username': author.username}), None),
+            ('get', reverse('profile_follow', kwargs={'username': author.username}), None),
+            ('get', reverse('api_index'), None),
+            ('get', reverse('api_group_posts', kwargs={'slug': group.slug}), None),
+            ('get', reverse('api_follow_index'), None),
+            ('get', reverse('api_profile', kwargs={'username': author.username}), None),
+            ('get', reverse('api_post', kwargs=post_kwargs), None),
+            ('post', reverse('api_bulk_follow'), json.dumps({'follow': [author.username]})),
+        )
+        for method, url, data in requests:
+            cache.clear()
+            # Строка вместо словаря - тело запроса в JSON.
+            extra = {'content_type': 'application/json'} if isinstance(data, str) else {}
+            response = getattr(user_client, method)(url, data, **extra)
+            assert response.status_code in (200, 302), \
+                f'Страница `{url}` работает неправильно'
@@ -0,0 +1,51 @@
+from django.db.backends.sqlite3 import base
+
+from yatube.db.pool import PooledDatabaseWrapperMixin
+
+
+# Значения по умолчанию для ключа PRAGMAS настроек базы; None в PRAGMAS
+# отключает соответствующую прагму.
+DEFAULT_PRAGMAS = {
+    # Читатели не ждут писателя, а писатель не ждёт читателей.
+    'journal_mode': 'wal',
+    # В режиме WAL fsync только на контрольных точках.
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение задаёт размер в килобайтах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+
+class TunedDatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с прагмами из ``PRAGMAS`` и транзакциями ``BEGIN IMMEDIATE``.
+
+    Прагмы ставятся один раз при открытии соединения. Транзакции
+    atomic() сразу берут блокировку записи (``IMMEDIATE_TRANSACTIONS``,
+    по умолчанию включено): отложенная транзакция, которая сначала
+    читает, а потом пишет, получает "database is locked" без ожидания
+    busy_timeout, если кто-то успел записать раньше.
+    """
+
+    def pragmas(self):
+        pragmas = {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+        return {name: value for name, value in pragmas.items()
+                if value is not None}
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas().items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict.get('IMMEDIATE_TRANSACTIONS', True):
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, TunedDatabaseWrapper):
+    """Настроенный SQLite; с ключом ``POOL`` ещё и с пулом соединений,
+    что заменяет серверную базу в тестах пула и при локальной отладке."""
@@ -0,0 +1,179 @@
+"""Пул соединений с базой для DATABASES с ключом ``POOL``.
+
+Django 2.2 открывает соединение заново на каждый запрос (или держит
+его не дольше CONN_MAX_AGE в своём потоке). Бэкенды из yatube.db.backends
+вместо закрытия возвращают соединение в общий пул процесса, а следующий
+запрос любого потока забирает его оттуда, поэтому установка соединения
+не попадает во время ответа.
+
+Параметры ``POOL``:
+
+* ``SIZE`` — сколько простаивающих соединений держать;
+* ``MIN`` — сколько соединений открыть заранее в warm_up();
+* ``HEALTH_CHECK_AFTER`` — через сколько секунд простоя соединение
+  проверяется запросом ``SELECT 1`` перед выдачей; ``None`` отключает
+  проверку.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {'SIZE': 10, 'MIN': 0, 'HEALTH_CHECK_AFTER': 30}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, size=10, health_check_after=30):
+        self.connect = connect
+        self.size = size
+        self.health_check_after = health_check_after
+        self.idle = collections.deque()
+        self.lock = threading.Lock()
+
+    def is_healthy(self, connection, idle_since):
+        if self.health_check_after is None:
+            return True
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                item = self.idle.pop() if self.idle else None
+            if item is None:
+                return self.connect()
+            connection, idle_since = item
+            if self.is_healthy(connection, idle_since):
+                return connection
+            logger.info('dropping unhealthy pooled connection')
+            self.discard(connection)
+
+    def release(self, connection):
+        """Возвращает соединение в пул, откатив незавершённую транзакцию."""
+        try:
+            connection.rollback()
+        except Exception:
+            self.discard(connection)
+            return
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((connection, time.monotonic()))
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def fill(self, count):
+        with self.lock:
+            missing = min(count, self.size) - len(self.idle)
+        for _ in range(missing):
+            self.release(self.connect())
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, collections.deque()
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def __len__(self):
+        return len(self.idle)
+
+
+def pool_options(settings_dict):
+    return {**DEFAULTS, **(settings_dict.get('POOL') or {})}
+
+
+def get_pool(wrapper, conn_params, connect):
+    """Пул для параметров соединения в текущем процессе.
+
+    Ключ включает pid, чтобы рабочие процессы после fork не делили
+    сокеты, открытые родителем.
+    """
+    key = (os.getpid(), wrapper.vendor, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = pool_options(wrapper.settings_dict)
+            pool = _pools[key] = ConnectionPool(
+                connect,
+                size=options['SIZE'],
+                health_check_after=options['HEALTH_CHECK_AFTER'],
+            )
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """Подмешивается к DatabaseWrapper бэкенда Django. Без ключа ``POOL``
+    в настройках базы бэкенд работает как обычно."""
+
+    @property
+    def pooled(self):
+        return 'POOL' in self.settings_dict
+
+    def get_pool(self, conn_params=None):
+        if conn_params is None:
+            conn_params = self.get_connection_params()
+        return get_pool(
+            self, conn_params,
+            lambda: super(PooledDatabaseWrapperMixin,
+                          self).get_new_connection(conn_params))
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        connection = self.get_pool(conn_params).acquire()
+        self.connection_acquired(connection)
+        return connection
+
+    def connection_acquired(self, connection):
+        """Переносит в обёртку состояние, которое бэкенд выставляет при
+        открытии соединения."""
+
+    def _close(self):
+        if not self.pooled:
+            return super()._close()
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            self.get_pool().release(self.connection)
+
+
+def warm_up():
+    """Заранее открывает ``POOL['MIN']`` соединений для каждой базы с
+    пулом; вызывается из yatube/wsgi.py при старте рабочего процесса."""
+    for wrapper in connections.all():
+        if not isinstance(wrapper, PooledDatabaseWrapperMixin):
+            continue
+        if not wrapper.pooled:
+            continue
+        options = pool_options(wrapper.settings_dict)
+        wrapper.get_pool().fill(options['MIN'])
@@ -0,0 +1,92 @@
+"""Чтение с реплик для лент и профилей.
+
+ReplicaRoutingMiddleware разрешает чтение с реплик только на время
+безопасных запросов к представлениям из REPLICA_READ_VIEWS. Остальные
+запросы, команды и фоновые задачи читают с основной базы. После любого
+изменяющего запроса браузер ещё REPLICA_STICKY_SECONDS читает с
+основной базы, чтобы пользователь сразу видел свои изменения, даже
+если реплика отстаёт.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('yatube_replica_reads', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+@contextmanager
+def primary():
+    """Читать с основной базы внутри блока."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    # Сессии читаются сразу после записи при входе, отставание реплики
+    # здесь означает разлогин.
+    primary_apps = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        available = replicas()
+        if (not available or not _replica_reads.get()
+                or model._meta.app_label in self.primary_apps):
+            return DEFAULT_DB_ALIAS
+        return random.choice(available)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        if request.method not in SAFE_METHODS:
+            window = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(STICKY_COOKIE,
+                                str(int(time.time() + window)),
+                                max_age=window,
+                                httponly=True,
+                                samesite='Lax')
+        return response
+
+    def is_sticky(self, request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        read_views = getattr(settings, 'REPLICA_READ_VIEWS', ())
+        if (request.method in SAFE_METHODS
+                and request.resolver_match.url_name in read_views
+                and not self.is_sticky(request)):
+            _replica_reads.set(True)
@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.instrumentation.InstrumentationMiddleware',
+    'yatube.db.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,7 +68,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'posts.instrumentation.InstrumentedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,15 +91,110 @@ LOGIN_REDIRECT_URL = 'index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Share of requests measured by posts.instrumentation: SQL, templates,
+# feed cache and thumbnails go to the Server-Timing header and to the
+# posts.instrumentation log. Outside DEBUG, attach a production handler
+# to that logger.
+
+POSTS_INSTRUMENTATION_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'require_debug_true': {
+            '()': 'django.utils.log.RequireDebugTrue',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['require_debug_true'],
+        },
+    },
+    'loggers': {
+        'posts.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# YATUBE_DB=postgresql switches to the production profile: a server
+# database reached through yatube.db.backends.postgresql, which keeps
+# connections in a per-process pool (see yatube/db/pool.py) and checks
+# idle ones with SELECT 1 before reuse. The same variables point the test
+# suite at a local stand-in server.
+
+if os.environ.get('YATUBE_DB') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'yatube.db.backends.postgresql',
+            'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+            'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+            'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+            'HOST': os.environ.get('YATUBE_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('YATUBE_DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'SIZE': int(os.environ.get('YATUBE_DB_POOL_SIZE', 10)),
+                'MIN': int(os.environ.get('YATUBE_DB_POOL_MIN', 2)),
+                'HEALTH_CHECK_AFTER': 30,
+            },
+        }
+    }
+else:
+    # yatube.db.backends.sqlite3 applies PRAGMAS to every new connection.
+    # WAL lets readers run alongside the single writer, and atomic() blocks
+    # start with BEGIN IMMEDIATE, so a read-then-write transaction waits up
+    # to busy_timeout instead of failing with "database is locked".
+    DATABASES = {
+        'default': {
+            'ENGINE': 'yatube.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'PRAGMAS': {
+                'journal_mode': 'wal',
+                'synchronous': 'normal',
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64 * 1024,
+                'busy_timeout': 5000,
+            },
+            'IMMEDIATE_TRANSACTIONS': True,
+            # A file rather than the shared-cache in-memory database, so
+            # threaded tests get busy_timeout instead of "table is locked".
+            'TEST': {
+                'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+            },
+        }
     }
-}
+
+# Read replicas. YATUBE_DB_REPLICA names the replica: a host for the
+# server profile, a file for SQLite. yatube.db.routers sends safe requests
+# to REPLICA_READ_VIEWS there. For REPLICA_STICKY_SECONDS after a write
+# the same browser reads from the primary again. Tests mirror the replica
+# onto the primary.
+
+DATABASE_ROUTERS = ['yatube.db.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_READ_VIEWS = ('index', 'group_posts', 'profile', 'post',
+                      'post_comments', 'follow_index', 'trending',
+                      'group_list', 'api_index', 'api_group_posts',
+                      'api_profile', 'api_post', 'api_follow_index')
+REPLICA_STICKY_SECONDS = 10
+
+if os.environ.get('YATUBE_DB_REPLICA'):
+    replica = dict(DATABASES['default'])
+    if os.environ.get('YATUBE_DB') == 'postgresql':
+        replica['HOST'] = os.environ['YATUBE_DB_REPLICA']
+    else:
+        replica['NAME'] = os.environ['YATUBE_DB_REPLICA']
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES['replica'] = replica
+    DATABASE_REPLICAS = ['replica']
 
 CACHES = {
     'default': {
@@ -105,6 +202,55 @@ CACHES = {
     }
 }
 
+# Feed pages are invalidated by signals (see posts.feed_cache), so they
+# may stay in the cache for a long time. Only the worker holding the
+# per-page lock recomputes a page; the lock expires after
+# POSTS_FEED_LOCK_TIMEOUT seconds. Follow feeds of an author's followers
+# are invalidated after commit by a pool of POSTS_FEED_BUMP_WORKERS
+# threads; 0 invalidates them inline.
+
+POSTS_FEED_CACHE_TIMEOUT = 60 * 60 * 24
+POSTS_FEED_LOCK_TIMEOUT = 10
+POSTS_FEED_BUMP_WORKERS = 1
+
+# Follow timeline
+# Authors with at least POSTS_TIMELINE_CELEBRITY_FOLLOWERS followers are
+# pulled at read time instead of being fanned out on write. A pulled
+# author who drops below POSTS_TIMELINE_FANOUT_FOLLOWERS gets their last
+# POSTS_TIMELINE_BACKFILL posts fanned out to every follower again. The
+# sync_timelines command, run every few minutes, does the switching, so
+# following and unfollowing never move timelines in the request.
+
+POSTS_TIMELINE_STORE = 'posts.timeline.DatabaseTimelineStore'
+POSTS_TIMELINE_CELEBRITY_FOLLOWERS = 1000
+POSTS_TIMELINE_FANOUT_FOLLOWERS = 800
+POSTS_TIMELINE_BACKFILL = 1000
+
+# Bulk follows (posts.follows) insert edges in batches and skip duplicates
+# via unique_follow. The JSON endpoint accepts at most
+# POSTS_BULK_FOLLOW_LIMIT authors per request.
+POSTS_BULK_FOLLOW_LIMIT = 1000
+
+# build_recommendations stores the best POSTS_RECOMMENDATIONS_TOP_K follow
+# suggestions per user; profile and follow pages show
+# POSTS_RECOMMENDATIONS_SHOWN of them.
+POSTS_RECOMMENDATIONS_TOP_K = 20
+POSTS_RECOMMENDATIONS_SHOWN = 5
+
+# Trending posts and groups (posts.trending). Comments and new posts are
+# counted in hourly buckets; roll_trending, run hourly, rescores them with
+# a POSTS_TRENDING_HALF_LIFE_HOURS half-life over the last
+# POSTS_TRENDING_WINDOW_HOURS. The trending page is cached for
+# POSTS_TRENDING_CACHE_TIMEOUT seconds between rolls.
+POSTS_TRENDING_HALF_LIFE_HOURS = 6
+POSTS_TRENDING_WINDOW_HOURS = 48
+POSTS_TRENDING_CACHE_TIMEOUT = 60
+
+# Group directory (posts.groups). Post counts and last activity are kept
+# up to date by signals; refresh_group_stats, run every few minutes,
+# stores the POSTS_GROUP_TOP_POSTERS most active authors of each group.
+POSTS_GROUP_TOP_POSTERS = 3
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -150,5 +296,20 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Post thumbnails are generated by a pool of worker processes
+# (see posts.thumbnails); 0 generates them inline.
+
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a
+# temporary file. PostForm rejects images over POSTS_IMAGE_MAX_BYTES or
+# POSTS_IMAGE_MAX_PIXELS after reading only their header, and drops Exif
+# blocks larger than POSTS_IMAGE_MAX_EXIF_BYTES.
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+POSTS_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 25 * 1000 * 1000
+POSTS_IMAGE_MAX_EXIF_BYTES = 64 * 1024
+
 
 
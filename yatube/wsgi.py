@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Open pooled database connections when the worker starts, not in its
+# first request.
+from yatube.db.pool import warm_up  # noqa: E402
+
+warm_up()